@@ -3,30 +3,50 @@ import os
 import datetime
 
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 
-import aiofiles
 import starlette.status as status
 from fastapi_filter import FilterDepends
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends, UploadFile
+from fastapi import APIRouter, Depends, UploadFile, Request
 
-from database import get_async_session
+from database import get_async_session, get_pool_stats, statement_timeout
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy import select, insert, update, delete
 from fastapi.exceptions import HTTPException
-from fastapi.responses import FileResponse
 
-from auth.schemas import UserLogin
-from auth.auth import pwd_context
-from auth.utils import generate_token, verify_token
+from auth.schemas import UserLogin, CurrentUser
+from auth.passwords import password_service
+from auth.utils import generate_token, verify_token, token_cache, get_current_user
 from models.models import Users, TaskStatus, Tasks, Degree, AdditionForTasks
+from settings import (
+    DB_STATEMENT_TIMEOUT_ADMIN,
+    ADDITION_BY_ID_CACHE_CONTROL,
+    ADDITION_BY_PATH_CACHE_CONTROL,
+)
+from mobile.stats import (
+    add_task_to_stats,
+    remove_task_from_stats,
+    move_task_in_stats,
+    get_stats_key,
+)
+from mobile.scheme import TaskScheme, TaskDetailScheme
+from mobile.utils import load_task, load_tasks
+from files.blobs import store_blob, release_blob, collect_blobs
 from .filters import AdminFilter
-from .utils import is_admin
+from files.storage import storage
+from .utils import (
+    require_admin,
+    invalidate_admin_role,
+    get_addition_response,
+    get_media_type,
+)
 from .scheme import InsertTask, Task, DegreeScheme, EditDegreeScheme
 
-admin_router = APIRouter()
+admin_router = APIRouter(
+    dependencies=[Depends(statement_timeout(DB_STATEMENT_TIMEOUT_ADMIN))]
+)
 
 
 @admin_router.post("/login")
@@ -36,7 +56,13 @@ async def login_user(
     user_existing_query = select(Users).where(Users.email == user.email)
     user_existing = await session.execute(user_existing_query)
     user_data = user_existing.scalars().one()
-    if pwd_context.verify(user.password, user_data.password):
+    is_valid, new_hash = await password_service.verify_and_update(
+        user.password, user_data.password
+    )
+    if is_valid:
+        if new_hash is not None:
+            user_data.password = new_hash
+            await session.commit()
         if user_data.status:
             token = generate_token(user_data.id)
             return token
@@ -54,19 +80,10 @@ async def login_user(
 @admin_router.post("/create-task")
 async def create_task(
     task: Task,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
+    current_user: CurrentUser = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    if await is_admin(user_id, session) is False:
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to the admin panel",
-        )
     if not isinstance(task.deadline, datetime.date):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -85,16 +102,14 @@ async def create_task(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Deadline cannot be in the past",
             )
-        get_degree_query = select(Users).where(Users.id == user_id)
-        degree__data = await session.execute(get_degree_query)
-        degree_data = degree__data.scalars().one()
         task_in_db = InsertTask(
             **dict(task),
-            degree=int(degree_data.degree),
+            degree=int(current_user.degree),
             status=TaskStatus.not_completed.value,
         )
         query = insert(Tasks).values(**dict(task_in_db))
         await session.execute(query)
+        await add_task_to_stats(session, task_in_db)
         await session.commit()
         task_info = InsertTask(**dict(task_in_db))
         return dict(task_info)
@@ -102,7 +117,7 @@ async def create_task(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@admin_router.get("/get-task-by-id")
+@admin_router.get("/get-task-by-id", response_model=TaskDetailScheme)
 async def get_task_by_id(
     task_id: int,
     token: dict = Depends(verify_token),
@@ -113,19 +128,7 @@ async def get_task_by_id(
             status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
         )
     try:
-        task_query = select(Tasks).where(Tasks.id == task_id)
-        task__data = await session.execute(task_query)
-        data = task__data.scalars().one()
-        get_user = select(Users).where(Users.id == data.user)
-        user__data = await session.execute(get_user)
-        user_data = user__data.scalars().one()
-        user_dict = {
-            key: getattr(user_data, key)
-            for key in user_data.__dict__.keys()
-            if key != "password"
-        }
-        data.user = user_dict
-        return data
+        return await load_task(session, task_id)
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found"
@@ -134,7 +137,7 @@ async def get_task_by_id(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@admin_router.get("/get-all-tasks")
+@admin_router.get("/get-all-tasks", response_model=List[TaskScheme])
 async def get_all_tasks(
     token: dict = Depends(verify_token),
     session: AsyncSession = Depends(get_async_session),
@@ -144,32 +147,12 @@ async def get_all_tasks(
             status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
         )
     try:
-        tasks_query = select(Tasks)
-        tasks_data = await session.execute(tasks_query)
-        tasks = tasks_data.scalars().all()
-
-        users_query = select(Users)
-        users_data = await session.execute(users_query)
-        users_dict = {user.id: user for user in users_data.scalars().all()}
-        for task in tasks:
-            user_id = task.user
-            if user_id in users_dict:
-                user_data = users_dict[user_id]
-                user_dict = {
-                    key: getattr(user_data, key)
-                    for key in user_data.__dict__.keys()
-                    if key != "password"
-                }
-                task.user = user_dict
-            else:
-                task.user = None
-
-        return tasks
+        return await load_tasks(session)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@admin_router.patch("/update-task")
+@admin_router.patch("/update-task", response_model=TaskDetailScheme)
 async def update_task(
     task_id: int,
     title: Optional[str] = None,
@@ -177,21 +160,17 @@ async def update_task(
     deadline: Optional[date] = None,
     importance: Optional[str] = None,
     user: Optional[int] = None,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            detail="Token not provided", status_code=status.HTTP_403_FORBIDDEN
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to admin panel",
-        )
 
     try:
+        # the row lock keeps concurrent writers from moving the stats twice
+        old_task_query = select(Tasks).where(Tasks.id == task_id).with_for_update()
+        old_task__data = await session.execute(old_task_query)
+        old_task = old_task__data.scalars().one()
+        old_stats_key = get_stats_key(old_task)
+
         select_query = update(Tasks).where(Tasks.id == task_id)
 
         values_to_update = {}
@@ -226,22 +205,11 @@ async def update_task(
             values_to_update["degree"] = user_data.degree
         update_query = select_query.values(values_to_update)
         await session.execute(update_query)
+        await session.refresh(old_task)
+        await move_task_in_stats(session, old_stats_key, get_stats_key(old_task))
         await session.commit()
 
-        info_query = select(Tasks).where(Tasks.id == task_id)
-        info__data = await session.execute(info_query)
-        info_data = info__data.scalars().one()
-        get_user = select(Users).where(Users.id == info_data.user)
-        user__data = await session.execute(get_user)
-        user_data = user__data.scalars().one()
-        user_dict = {
-            key: getattr(user_data, key)
-            for key in user_data.__dict__.keys()
-            if key != "password"
-        }
-        info_data.user = user_dict
-
-        return info_data
+        return await load_task(session, task_id)
     except NoResultFound:
         raise HTTPException(
             detail="Task or user not found that given id",
@@ -254,27 +222,19 @@ async def update_task(
 @admin_router.delete("/delete-task")
 async def destroy_task(
     task_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            detail="Token not provided", status_code=status.HTTP_403_FORBIDDEN
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            detail="This user does not have access to admin panel",
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-        )
-    data = select(Tasks).where(Tasks.id == task_id)
+    data = select(Tasks).where(Tasks.id == task_id).with_for_update()
     delete_data = await session.execute(data)
-    if not delete_data.scalars().one_or_none():
+    task_data = delete_data.scalars().one_or_none()
+    if not task_data:
         raise HTTPException(
             detail="Task not found that given id",
             status_code=status.HTTP_404_NOT_FOUND,
         )
     try:
+        await remove_task_from_stats(session, task_data)
         delete_query = delete(Tasks).where(Tasks.id == task_id)
         await session.execute(delete_query)
         await session.commit()
@@ -287,19 +247,9 @@ async def destroy_task(
 @admin_router.get("/get-tasks-by-filter")
 async def get_tasks_by_filter(
     admin_filter: AdminFilter = FilterDepends(AdminFilter),
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            detail="Token not provided", status_code=status.HTTP_403_FORBIDDEN
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            detail="This user does not have access to admin panel",
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-        )
     try:
         query = admin_filter.filter(select(Tasks))
         query__data = await session.execute(query)
@@ -312,19 +262,9 @@ async def get_tasks_by_filter(
 @admin_router.post("/create-degree")
 async def create_degree(
     degree: DegreeScheme,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            detail="Token not provided", status_code=status.HTTP_403_FORBIDDEN
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            detail="This user does not have access to admin panel",
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-        )
     try:
         create_query = insert(Degree).values(degree=degree.degree)
         await session.execute(create_query)
@@ -345,19 +285,9 @@ async def create_degree(
 @admin_router.patch("/edit-degree")
 async def edit_degree(
     degree: EditDegreeScheme,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to admin panel",
-        )
     degree_existing_query = select(Degree).where(Degree.id == degree.id)
     data = await session.execute(degree_existing_query)
     if not data.scalars().one_or_none():
@@ -392,19 +322,9 @@ async def edit_degree(
 
 @admin_router.get("/get-all-degrees")
 async def get_all_degrees(
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to admin panel",
-        )
     try:
         select_query = select(Degree)
         degrees__data = await session.execute(select_query)
@@ -417,19 +337,9 @@ async def get_all_degrees(
 @admin_router.get("/degree-detail")
 async def get_degree_detail(
     degree_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provideds"
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to admin panel",
-        )
     degree_existing = select(Degree).where(Degree.id == degree_id)
     degree_data = await session.execute(degree_existing)
     if not degree_data.scalars().one_or_none():
@@ -451,19 +361,9 @@ async def get_degree_detail(
 @admin_router.delete("/delete-degree")
 async def delete_degree(
     degree_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to admin panel",
-        )
     degree_existing = select(Degree).where(Degree.id == degree_id)
     degree__data = await session.execute(degree_existing)
     if not degree__data.scalars().one_or_none():
@@ -484,7 +384,8 @@ async def delete_degree(
 async def add_addition_to_task(
     task_id: int,
     file: UploadFile,
-    token: dict = Depends(verify_token),
+    request: Request,
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
     task_existing = select(Tasks).where(Tasks.id == task_id)
@@ -493,36 +394,20 @@ async def add_addition_to_task(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Task not found that given id"
         )
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to admin panel",
-        )
     try:
-        base_filename, file_extension = os.path.splitext(file.filename)
-        out_file = f"uploads/AdditionForTasks/{file.filename}"
-        index = 1
-        while os.path.exists(out_file):
-            out_file = (
-                f"uploads/AdditionForTasks/{base_filename}_{index}{file_extension}"
-            )
-            index += 1
-
-        async with aiofiles.open(out_file, "wb") as f:
-            content = await file.read()
-            await f.write(content)
+        filename = os.path.basename(file.filename)
+        out_file = await store_blob(session, file)
 
         inserting_query = insert(AdditionForTasks).values(
-            task_id=task_id, file=out_file
+            task_id=task_id, file=out_file, filename=filename
         )
         await session.execute(inserting_query)
         await session.commit()
-        return FileResponse(out_file, filename=os.path.basename(out_file))
+        return await storage.download_response(
+            request, out_file, filename, get_media_type(filename)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -530,19 +415,9 @@ async def add_addition_to_task(
 @admin_router.delete("/delete-addition-from-task")
 async def delete_addition_from_task(
     addition_id: int,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            detail="Token not provided", status_code=status.HTTP_403_FORBIDDEN
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to admin panel",
-        )
     addition_existing = select(AdditionForTasks).where(
         AdditionForTasks.id == addition_id
     )
@@ -555,13 +430,13 @@ async def delete_addition_from_task(
         )
     try:
         out_file = addition_data.file
-        if os.path.exists(out_file):
-            os.remove(out_file)
+        await release_blob(session, out_file)
         delete_query = delete(AdditionForTasks).where(
             AdditionForTasks.id == addition_id
         )
         await session.execute(delete_query)
         await session.commit()
+        await collect_blobs(session, [out_file])
         await session.close()
         return {"success": True, "status": status.HTTP_204_NO_CONTENT}
     except Exception as e:
@@ -570,19 +445,9 @@ async def delete_addition_from_task(
 
 @admin_router.get("/get-all-additions")
 async def get_all_additions(
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to the admin panel",
-        )
     try:
         select_query = select(AdditionForTasks)
         additions_data = await session.execute(select_query)
@@ -607,21 +472,10 @@ async def get_all_additions(
 @admin_router.get("/get-addition-by-id")
 async def get_addition_by_id(
     addition_id: int,
-    token: dict = Depends(verify_token),
+    request: Request,
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to the admin panel",
-        )
-
     try:
         addition_existing = select(AdditionForTasks).where(
             AdditionForTasks.id == addition_id
@@ -635,13 +489,11 @@ async def get_addition_by_id(
         )
 
     try:
-        file_path = addition_data.file
-        if not os.path.exists(file_path):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="File not found, but addition exists",
-            )
-        return FileResponse(file_path, filename=os.path.basename(file_path))
+        return await get_addition_response(
+            request, session, addition_data, ADDITION_BY_ID_CACHE_CONTROL
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
@@ -649,38 +501,30 @@ async def get_addition_by_id(
 @admin_router.get("/get-addition-by-path")
 async def get_addition_by_path(
     path: str,
-    token: dict = Depends(verify_token),
+    request: Request,
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to the admin panel",
-        )
     try:
         addition_existing = select(AdditionForTasks).where(
             AdditionForTasks.file == path
         )
         addition_data = await session.execute(addition_existing)
-        addition_data = addition_data.scalars().one()
+        # identical files share one blob, any addition pointing at it will do
+        addition_data = addition_data.scalars().first()
+        if addition_data is None:
+            raise NoResultFound
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Addition not found that given path",
         )
     try:
-        path = addition_data.file
-        if not os.path.exists(path):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="File not found, but addition exists",
-            )
-        return FileResponse(path, filename=os.path.basename(path))
+        return await get_addition_response(
+            request, session, addition_data, ADDITION_BY_PATH_CACHE_CONTROL
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
@@ -689,19 +533,9 @@ async def get_addition_by_path(
 async def update_addition(
     addition_id: int,
     new_file: UploadFile,
-    token: dict = Depends(verify_token),
+    token: dict = Depends(require_admin),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    if not await is_admin(user_id, session):
-        raise HTTPException(
-            status_code=status.HTTP_406_NOT_ACCEPTABLE,
-            detail="This user does not have access to the admin panel",
-        )
     try:
         existing_addition = select(AdditionForTasks).where(
             AdditionForTasks.id == addition_id
@@ -714,28 +548,65 @@ async def update_addition(
             detail="Addition not found with the given id",
         )
     try:
-        base_filename, file_extension = os.path.splitext(new_file.filename)
-        out_file = f"uploads/AdditionForTasks/{new_file.filename}"
-        index = 1
-        while os.path.exists(out_file):
-            out_file = (
-                f"uploads/AdditionForTasks/{base_filename}_{index}{file_extension}"
-            )
-            index += 1
+        out_file = await store_blob(session, new_file)
 
         removable_path = addition_data.file
-        if os.path.exists(removable_path):
-            os.remove(removable_path)
-        async with aiofiles.open(out_file, "wb") as f:
-            content = await new_file.read()
-            await f.write(content)
+        await release_blob(session, removable_path)
         update_query = (
             update(AdditionForTasks)
             .where(AdditionForTasks.id == addition_id)
-            .values(file=out_file)
+            .values(file=out_file, filename=os.path.basename(new_file.filename))
         )
         await session.execute(update_query)
         await session.commit()
+        await collect_blobs(session, [removable_path])
         return {"message": "Addition updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@admin_router.get("/password-pool-stats")
+async def get_password_pool_stats(
+    token: dict = Depends(require_admin),
+    session: AsyncSession = Depends(get_async_session),
+):
+    return password_service.get_stats()
+
+
+@admin_router.get("/token-cache-stats")
+async def get_token_cache_stats(
+    token: dict = Depends(require_admin),
+    session: AsyncSession = Depends(get_async_session),
+):
+    return token_cache.get_stats()
+
+
+@admin_router.patch("/update-user-status")
+async def update_user_status(
+    user_id: int,
+    is_admin: bool,
+    token: dict = Depends(require_admin),
+    session: AsyncSession = Depends(get_async_session),
+):
+    user_existing = select(Users.id).where(Users.id == user_id)
+    user__data = await session.execute(user_existing)
+    if user__data.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found that given id",
+        )
+    try:
+        update_query = update(Users).where(Users.id == user_id).values(status=is_admin)
+        await session.execute(update_query)
+        await session.commit()
+        invalidate_admin_role(user_id)
+        return {"success": True, "user_id": user_id, "is_admin": is_admin}
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@admin_router.get("/pool-stats")
+async def get_database_pool_stats(token: dict = Depends(require_admin)):
+    return get_pool_stats()
@@ -1,10 +1,76 @@
+import mimetypes
+import os
+
+import starlette.status as status
+from fastapi import Depends, HTTPException, Request
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth.user_cache import UserCache
+from auth.utils import verify_token, user_cache
+from database import get_async_session
+from files.responses import (
+    get_etag,
+    get_cache_headers,
+    is_not_modified,
+    not_modified_response,
+)
+from files.storage import storage
+from models.models import Users, Blob
+from settings import ADMIN_ROLE_CACHE_TTL, USER_CACHE_SIZE
 
-from models.models import Users
+# tokens carry no role, so a demotion reaches every worker within
+# ADMIN_ROLE_CACHE_TTL
+role_cache = UserCache(ADMIN_ROLE_CACHE_TTL, USER_CACHE_SIZE)
 
 
 async def is_admin(user_id, session):
-    user_query = select(Users).where((Users.id == user_id) & (Users.status is True))
+    cached = role_cache.get(user_id)
+    if cached is not None:
+        return cached
+    user_query = select(Users.status).where(Users.id == user_id)
     user__data = await session.execute(user_query)
-    user = user__data.scalars()
-    return user is not None
+    result = user__data.scalar_one_or_none() is True
+    role_cache.set(user_id, result)
+    return result
+
+
+def invalidate_admin_role(user_id):
+    role_cache.invalidate(user_id)
+    user_cache.invalidate(user_id)
+
+
+async def require_admin(
+    token: dict = Depends(verify_token),
+    session: AsyncSession = Depends(get_async_session),
+):
+    if not await is_admin(token.get("user_id"), session):
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="This user does not have access to the admin panel",
+        )
+    return token
+
+
+def get_media_type(filename: str):
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+async def get_addition_response(
+    request: Request, session, addition, cache_control: str = None
+):
+    filename = addition.filename or os.path.basename(addition.file)
+    blob__data = await session.execute(
+        select(Blob.checksum, Blob.created_at).where(Blob.path == addition.file)
+    )
+    blob = blob__data.one_or_none()
+    headers = {}
+    if blob is not None:
+        # blob content never changes, the checksum is a strong validator
+        etag = get_etag(blob.checksum)
+        headers = get_cache_headers(etag, blob.created_at, cache_control)
+        if is_not_modified(request, etag, blob.created_at):
+            return not_modified_response(headers)
+    return await storage.download_response(
+        request, addition.file, filename, get_media_type(filename), headers
+    )
@@ -1,33 +1,33 @@
 import os
-from typing import List
-
-import aiofiles
-import redis
+from typing import Optional
 
 import starlette.status as status
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from passlib.context import CryptContext
 from pydantic import EmailStr
 from sqlalchemy import select, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import get_async_session
+from redis_client import redis_store
+from files.blobs import store_blob, release_blob, collect_blobs
+from settings import VERIFICATION_CODE_TTL, DIRECTORY_PAGE_SIZE, PHOTO_MAX_SIZE
 from models.models import Users, Degree
-from .schemas import UserInfo, InsertUser, UserLogin
+from .directory import get_user_directory
+from .schemas import UserInfo, InsertUser, UserLogin, CurrentUser, DirectoryPage
+from .passwords import password_service
 from .utils import (
     send_mail,
     generate_token,
     verify_token,
     send_mail_for_forget_password,
     get_user_data,
-)
-
-redis_client = redis.StrictRedis(
-    host="localhost", port=6379, db=0, decode_responses=True
+    revoke_token,
+    revoke_user_tokens,
+    get_current_user,
+    user_cache,
 )
 
 auth_router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 @auth_router.post("/register")
@@ -67,13 +67,12 @@ async def register_user(
                 detail="Email already exists !!!",
             )
         not_hashed_password = password
-        password = pwd_context.hash(password)
+        password = await password_service.hash(password)
         out_file = ""
         if user_photo is not None:
-            out_file = f"userPhotos/{user_photo.filename}"
-            async with aiofiles.open(f"uploads/{out_file}", "wb") as f:
-                content = await user_photo.read()
-                await f.write(content)
+            # user_photo keeps paths relative to uploads/
+            photo_path = await store_blob(session, user_photo, PHOTO_MAX_SIZE)
+            out_file = os.path.relpath(photo_path, "uploads")
 
         user_data = {
             "first_name": first_name,
@@ -88,8 +87,9 @@ async def register_user(
         user_in_db = InsertUser(**user_data)
         insert_query = insert(Users).values(**dict(user_in_db)).returning(Users.id)
         insert__data = await session.execute(insert_query)
-        await session.commit()
         user_id = insert__data.scalars().one()
+        await send_mail(session, email, not_hashed_password)
+        await session.commit()
         stts = True
 
         info_user = UserInfo(
@@ -102,9 +102,10 @@ async def register_user(
             user_photo=out_file,
             status=stts,
         )
-        send_mail(email, not_hashed_password)
         return dict(info_user)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -117,7 +118,13 @@ async def login_user(
         user_existing_query = select(Users).where(Users.email == user.email)
         user_existing = await session.execute(user_existing_query)
         user_data = user_existing.scalars().one()
-        if pwd_context.verify(user.password, user_data.password):
+        is_valid, new_hash = await password_service.verify_and_update(
+            user.password, user_data.password
+        )
+        if is_valid:
+            if new_hash is not None:
+                user_data.password = new_hash
+                await session.commit()
             token = generate_token(user_data.id)
             return token
         else:
@@ -129,22 +136,23 @@ async def login_user(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-# this api also used for admin panel
-@auth_router.get("/user/user-info", response_model=UserInfo)
-async def user_info(
-    token: dict = Depends(verify_token),
-    session: AsyncSession = Depends(get_async_session),
-):
+@auth_router.post("/logout")
+async def logout_user(token: dict = Depends(verify_token)):
     if token is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
         )
+    await revoke_token(token)
+    return {"success": True, "detail": "Logged out"}
 
-    user_id = token.get("user_id")
+
+# this api also used for admin panel
+@auth_router.get("/user/user-info", response_model=UserInfo)
+async def user_info(
+    current_user: CurrentUser = Depends(get_current_user),
+):
     try:
-        query = select(Users).where(Users.id == user_id)
-        query_data = await session.execute(query)
-        data = query_data.scalars().one()
+        data = current_user
         return UserInfo(
             **{
                 key: (
@@ -159,8 +167,12 @@ async def user_info(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@auth_router.get("/user/all-user-info", response_model=List[UserInfo])
+@auth_router.get("/user/all-user-info", response_model=DirectoryPage)
 async def user_info(
+    limit: int = DIRECTORY_PAGE_SIZE,
+    after: Optional[int] = None,
+    search: Optional[str] = None,
+    degree: Optional[int] = None,
     token: dict = Depends(verify_token),
     session: AsyncSession = Depends(get_async_session),
 ):
@@ -168,29 +180,9 @@ async def user_info(
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
         )
-
     user_id = token.get("user_id")
     try:
-        query = select(Users).where(Users.id != user_id)
-        query_data = await session.execute(query)
-        data = query_data.scalars().all()
-
-        user_info_list = []
-        for user in data:
-            user_info_list.append(
-                UserInfo(
-                    **{
-                        key: (
-                            getattr(user, key)
-                            if getattr(user, key) is not None
-                            else ("None" if isinstance(key, str) else 0)
-                        )
-                        for key in UserInfo.__fields__.keys()
-                    }
-                )
-            )
-
-        return user_info_list
+        return await get_user_directory(session, user_id, limit, after, search, degree)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -243,6 +235,7 @@ async def edit_account(
 
         await session.execute(update_query)
         await session.commit()
+        user_cache.invalidate(user_id)
 
         query = select(Users).where(Users.id == user_id)
         query_data = await session.execute(query)
@@ -266,21 +259,18 @@ async def edit_account(
 # this api also used for admin panel
 @auth_router.get("/user/send-verification-change-password")
 async def send_verification_to_change_password(
-    token: dict = Depends(verify_token),
+    current_user: CurrentUser = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Token not provided",
-        )
-    user_id = token.get("user_id")
     try:
-        query = select(Users).where(Users.id == user_id)
-        query_data = await session.execute(query)
-        data = query_data.scalars().one()
-        variable = send_mail_for_forget_password(data.email, data.first_name)
-        redis_client.set(data.email, variable)
+        data = current_user
+        variable = await send_mail_for_forget_password(
+            session, data.email, data.first_name
+        )
+        await session.commit()
+        await redis_store.set(
+            f"verification:{data.email}", variable, ttl=VERIFICATION_CODE_TTL
+        )
         return {"status": "success", "detail": "Check your email"}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -292,17 +282,17 @@ async def change_password(
     confirmation_code: int,
     new_password: str,
     new_password_confirmation: str,
-    token: dict = Depends(verify_token),
+    current_user: CurrentUser = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
+    user_id = current_user.id
+    if new_password != new_password_confirmation:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Token not provided",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Passwords do not match",
         )
-    user_id = token.get("user_id")
-    user_data = await get_user_data(session, user_id)
-    variable = redis_client.get(user_data.email)
+    # the code is consumed on the first attempt, so it cannot be brute-forced
+    variable = await redis_store.pop(f"verification:{current_user.email}")
     if variable is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -313,27 +303,20 @@ async def change_password(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Confirmation code is incorrect",
         )
-    if new_password != new_password_confirmation:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Passwords do not match",
-        )
-    user_id = token.get("user_id")
 
     try:
-        password = pwd_context.hash(new_password)
+        password = await password_service.hash(new_password)
         user_update_query = (
             update(Users).where(Users.id == user_id).values(password=password)
         )
         await session.execute(user_update_query)
         await session.commit()
-        get_user = await get_user_data(session, user_id)
-        redis_client.delete(user_data.email)
+        await revoke_user_tokens(user_id)
         return UserInfo(
             **{
                 key: (
-                    getattr(get_user, key)
-                    if getattr(get_user, key) is not None
+                    getattr(current_user, key)
+                    if getattr(current_user, key) is not None
                     else ("None" if isinstance(key, str) else 0)
                 )
                 for key in UserInfo.__fields__.keys()
@@ -358,18 +341,16 @@ async def update_user_photo(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
             )
 
+        photo_path = await store_blob(session, user_photo, PHOTO_MAX_SIZE)
+        old_photo_path = None
         if user_data.user_photo:
             old_photo_path = f"uploads/{user_data.user_photo}"
-            if os.path.exists(old_photo_path):
-                os.remove(old_photo_path)
-
-        new_photo_path = f"userPhotos/{user_photo.filename}"
-        async with aiofiles.open(f"uploads/{new_photo_path}", "wb") as f:
-            content = await user_photo.read()
-            await f.write(content)
+            await release_blob(session, old_photo_path)
 
-        user_data.user_photo = new_photo_path
+        user_data.user_photo = os.path.relpath(photo_path, "uploads")
         await session.commit()
+        user_cache.invalidate(user_id)
+        await collect_blobs(session, [old_photo_path])
 
         return UserInfo(
             **{
@@ -381,6 +362,8 @@ async def update_user_photo(
                 for key in UserInfo.__fields__.keys()
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
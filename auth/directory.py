@@ -0,0 +1,62 @@
+from sqlalchemy import select, func, or_
+
+from models.models import Users
+from settings import DIRECTORY_PAGE_SIZE, DIRECTORY_MAX_PAGE_SIZE
+
+DIRECTORY_COLUMNS = (
+    Users.id,
+    Users.first_name,
+    Users.last_name,
+    Users.phone_number,
+    Users.degree,
+    Users.email,
+    Users.user_photo,
+    Users.status,
+)
+
+SEARCH_COLUMNS = (Users.first_name, Users.last_name, Users.email, Users.phone_number)
+
+
+def escape_like(value: str):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def get_directory_query(user_id, limit, after=None, search=None, degree=None):
+    query = select(*DIRECTORY_COLUMNS).where(Users.id != user_id)
+    if after is not None:
+        query = query.where(Users.id > after)
+    if degree is not None:
+        query = query.where(Users.degree == degree)
+    if search:
+        # lower(column) LIKE 'prefix%' is served by the text_pattern_ops indexes
+        prefix = f"{escape_like(search.strip().lower())}%"
+        query = query.where(
+            or_(
+                *(
+                    func.lower(column).like(prefix, escape="\\")
+                    for column in SEARCH_COLUMNS
+                )
+            )
+        )
+    return query.order_by(Users.id).limit(limit + 1)
+
+
+async def get_user_directory(
+    session,
+    user_id: int,
+    limit: int = DIRECTORY_PAGE_SIZE,
+    after: int = None,
+    search: str = None,
+    degree: int = None,
+):
+    limit = max(1, min(limit, DIRECTORY_MAX_PAGE_SIZE))
+    query = get_directory_query(user_id, limit, after, search, degree)
+    user__data = await session.execute(query)
+    users = [dict(row._mapping) for row in user__data.all()]
+    has_more = len(users) > limit
+    users = users[:limit]
+    return {
+        "users": users,
+        "after": users[-1]["id"] if users else after,
+        "has_more": has_more,
+    }
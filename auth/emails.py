@@ -0,0 +1,121 @@
+import re
+from email.message import EmailMessage
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from settings import mail_username
+
+EMAIL_TEMPLATES_DIR = "templates/emails"
+
+STYLE_BLOCK_RE = re.compile(r"<style[^>]*>(.*?)</style>", re.S | re.I)
+CSS_RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+OPEN_TAG_RE = re.compile(r"<([a-zA-Z][a-zA-Z0-9]*)(\s[^<>]*?)?(/?)>")
+CLASS_ATTR_RE = re.compile(r"""class\s*=\s*["']([^"']*)["']""", re.I)
+STYLE_ATTR_RE = re.compile(r"""\s*style\s*=\s*["']([^"']*)["']""", re.I)
+SIMPLE_SELECTOR_RE = re.compile(r"^(\.?[a-zA-Z][a-zA-Z0-9_-]*)$")
+
+
+def parse_css_rules(css: str):
+    simple_rules = {}
+    other_rules = []
+    for selectors, declarations in CSS_RULE_RE.findall(css):
+        declarations = "; ".join(
+            " ".join(item.split())
+            for item in declarations.split(";")
+            if item.strip()
+        )
+        for selector in selectors.split(","):
+            selector = selector.strip()
+            if SIMPLE_SELECTOR_RE.match(selector):
+                simple_rules.setdefault(selector, []).append(declarations)
+            else:
+                other_rules.append(f"{selector} {{ {declarations} }}")
+    return simple_rules, other_rules
+
+
+def inline_css(html: str):
+    simple_rules = {}
+    other_rules = []
+    for css in STYLE_BLOCK_RE.findall(html):
+        rules, others = parse_css_rules(css)
+        for selector, declarations in rules.items():
+            simple_rules.setdefault(selector, []).extend(declarations)
+        other_rules.extend(others)
+    if not simple_rules and not other_rules:
+        return html
+
+    def add_style(match):
+        tag, attrs, closing = match.group(1), match.group(2) or "", match.group(3)
+        tag = tag.lower()
+        if tag in ("html", "head", "style", "meta", "title", "link"):
+            return match.group(0)
+        declarations = list(simple_rules.get(tag, []))
+        class_attr = CLASS_ATTR_RE.search(attrs)
+        if class_attr:
+            for class_name in class_attr.group(1).split():
+                declarations.extend(simple_rules.get(f".{class_name}", []))
+        if not declarations:
+            return match.group(0)
+        style_attr = STYLE_ATTR_RE.search(attrs)
+        if style_attr:
+            # styles written on the element win over stylesheet rules
+            declarations.append(style_attr.group(1).strip().rstrip(";"))
+            attrs = attrs[: style_attr.start()] + attrs[style_attr.end() :]
+        style = "; ".join(declarations)
+        return f'<{tag}{attrs} style="{style}"{closing}>'
+
+    html = STYLE_BLOCK_RE.sub("", html)
+    html = OPEN_TAG_RE.sub(add_style, html)
+    if other_rules:
+        html = html.replace(
+            "</head>", f"<style>{' '.join(other_rules)}</style></head>", 1
+        )
+    return html
+
+
+class EmailTemplateRegistry:
+    def __init__(self, directory: str):
+        self.env = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=select_autoescape(["html"]),
+            auto_reload=False,
+        )
+        self.templates = {}
+
+    def get_template(self, name: str):
+        template = self.templates.get(name)
+        if template is None:
+            source, _, _ = self.env.loader.get_source(self.env, name)
+            template = self.env.from_string(inline_css(source))
+            self.templates[name] = template
+        return template
+
+    def load_all(self):
+        for name in self.env.list_templates(extensions=["html"]):
+            self.get_template(name)
+
+    def render(self, name: str, **context):
+        return self.get_template(name).render(**context)
+
+    def build_message(self, name: str, subject: str, recipient: str, **context):
+        email = EmailMessage()
+        email["Subject"] = subject
+        email["From"] = mail_username
+        email["To"] = recipient
+        email.set_content(self.render(name, **context), subtype="html")
+        return email
+
+    def build_messages(self, name: str, subject: str, recipients: list):
+        template = self.get_template(name)
+        messages = []
+        for context in recipients:
+            email = EmailMessage()
+            email["Subject"] = subject
+            email["From"] = mail_username
+            email["To"] = context["user_email"]
+            email.set_content(template.render(**context), subtype="html")
+            messages.append(email)
+        return messages
+
+
+email_templates = EmailTemplateRegistry(EMAIL_TEMPLATES_DIR)
@@ -0,0 +1,208 @@
+import asyncio
+import email
+import email.policy
+import smtplib
+import threading
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert
+
+from database import async_session_maker
+from models.models import MailOutbox, MailStatus
+from settings import (
+    mail_username,
+    mail_password,
+    mail_server,
+    mail_port,
+    MAIL_USE_SSL,
+    MAIL_OUTBOX_BATCH_SIZE,
+    MAIL_OUTBOX_POLL_INTERVAL,
+    MAIL_OUTBOX_MAX_ATTEMPTS,
+    MAIL_OUTBOX_RETRY_BACKOFF,
+    MAIL_OUTBOX_LEASE,
+    MAIL_SMTP_TIMEOUT,
+)
+
+
+async def enqueue_mail(session, message):
+    query = insert(MailOutbox).values(
+        recipient=message["To"],
+        subject=message["Subject"],
+        message=message.as_string(),
+        status=MailStatus.pending.value,
+    )
+    await session.execute(query)
+
+
+async def enqueue_mails(session, messages):
+    if not messages:
+        return
+    values = [
+        {
+            "recipient": message["To"],
+            "subject": message["Subject"],
+            "message": message.as_string(),
+            "status": MailStatus.pending.value,
+        }
+        for message in messages
+    ]
+    await session.execute(insert(MailOutbox), values)
+
+
+class SMTPConnection:
+    def __init__(self, host, port, username, password, use_ssl=True, timeout=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.server = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self.server = server
+
+    def close(self):
+        with self.lock:
+            if self.server is not None:
+                try:
+                    self.server.quit()
+                except smtplib.SMTPException:
+                    pass
+                self.server = None
+
+    def send(self, raw_message: str):
+        message = email.message_from_string(raw_message, policy=email.policy.default)
+        with self.lock:
+            if self.server is None:
+                self.connect()
+            try:
+                self.server.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                # the server dropped the idle connection, reconnect once
+                self.connect()
+                self.server.send_message(message)
+            except OSError:
+                self.server = None
+                raise
+
+
+class MailOutboxWorker:
+    def __init__(
+        self, connection, batch_size, poll_interval, max_attempts, backoff, lease
+    ):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await asyncio.to_thread(self.connection.close)
+
+    async def run(self):
+        while True:
+            try:
+                processed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Mail outbox worker error: {e}")
+                processed = 0
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def claim(self):
+        # rows left in sending by a crashed worker come back once the lease ends
+        async with async_session_maker() as session:
+            now = datetime.utcnow()
+            query = (
+                select(MailOutbox)
+                .where(
+                    MailOutbox.status.in_(
+                        [MailStatus.pending.value, MailStatus.sending.value]
+                    )
+                    & (MailOutbox.next_attempt_at <= now)
+                )
+                .order_by(MailOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            messages__data = await session.execute(query)
+            messages = messages__data.scalars().all()
+            for message in messages:
+                message.status = MailStatus.sending.value
+                message.next_attempt_at = now + timedelta(seconds=self.lease)
+            await session.commit()
+            return [(message.id, message.message) for message in messages]
+
+    async def finish(self, message_id: int, error: Exception = None):
+        async with async_session_maker() as session:
+            message = await session.get(MailOutbox, message_id)
+            message.attempts += 1
+            if error is not None:
+                message.last_error = str(error)
+                if message.attempts >= self.max_attempts:
+                    message.status = MailStatus.failed.value
+                else:
+                    delay = self.backoff * 2 ** (message.attempts - 1)
+                    message.status = MailStatus.pending.value
+                    message.next_attempt_at = datetime.utcnow() + timedelta(
+                        seconds=delay
+                    )
+            else:
+                message.status = MailStatus.sent.value
+                message.sent_at = datetime.utcnow()
+                # the body may hold credentials or codes, keep only the metadata
+                message.message = ""
+            await session.commit()
+
+    async def drain_once(self):
+        # smtp runs outside any transaction, each result is committed on its own
+        messages = await self.claim()
+        for message_id, raw_message in messages:
+            try:
+                await asyncio.to_thread(self.connection.send, raw_message)
+            except Exception as e:
+                await self.finish(message_id, e)
+                continue
+            await self.finish(message_id)
+        return len(messages)
+
+
+mail_worker = MailOutboxWorker(
+    SMTPConnection(
+        mail_server,
+        mail_port,
+        mail_username,
+        mail_password,
+        MAIL_USE_SSL,
+        MAIL_SMTP_TIMEOUT,
+    ),
+    MAIL_OUTBOX_BATCH_SIZE,
+    MAIL_OUTBOX_POLL_INTERVAL,
+    MAIL_OUTBOX_MAX_ATTEMPTS,
+    MAIL_OUTBOX_RETRY_BACKOFF,
+    MAIL_OUTBOX_LEASE,
+)
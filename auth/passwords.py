@@ -0,0 +1,98 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+from settings import (
+    PASSWORD_BCRYPT_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_CONCURRENCY,
+    PASSWORD_HASH_EXECUTOR,
+)
+
+# min/max rounds equal to the default make passlib flag hashes made with any
+# other cost factor, so they get rehashed on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_rounds=PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__max_rounds=PASSWORD_BCRYPT_ROUNDS,
+)
+
+
+def hash_password(password: str):
+    return pwd_context.hash(password)
+
+
+def verify_and_update_password(password: str, hashed_password: str):
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+class PasswordService:
+    def __init__(self, workers: int, concurrency: int, executor: str = "thread"):
+        if executor == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="password"
+            )
+        self.executor_type = executor
+        self.workers = workers
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.total_wait_time = 0.0
+        self.total_run_time = 0.0
+
+    async def run(self, func, *args):
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        queued_at = time.perf_counter()
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started_at = time.perf_counter()
+        self.total_wait_time += started_at - queued_at
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.total_run_time += time.perf_counter() - started_at
+            self.semaphore.release()
+
+    async def hash(self, password: str):
+        return await self.run(hash_password, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str):
+        return await self.run(verify_and_update_password, password, hashed_password)
+
+    def get_stats(self):
+        return {
+            "executor": self.executor_type,
+            "workers": self.workers,
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "avg_wait_ms": (
+                self.total_wait_time / self.completed * 1000 if self.completed else 0
+            ),
+            "avg_run_ms": (
+                self.total_run_time / self.completed * 1000 if self.completed else 0
+            ),
+        }
+
+
+password_service = PasswordService(
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_CONCURRENCY, PASSWORD_HASH_EXECUTOR
+)
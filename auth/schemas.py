@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from fastapi import UploadFile, Depends
 from pydantic import BaseModel, EmailStr, Field
 
@@ -13,6 +15,23 @@ class UserInfo(BaseModel):
     status: bool
 
 
+class DirectoryUser(BaseModel):
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    phone_number: Optional[str] = None
+    degree: Optional[int] = None
+    email: Optional[str] = None
+    user_photo: Optional[str] = None
+    status: Optional[bool] = None
+
+
+class DirectoryPage(BaseModel):
+    users: List[DirectoryUser]
+    after: Optional[int] = None
+    has_more: bool
+
+
 class InsertUser(BaseModel):
     first_name: str
     last_name: str
@@ -26,3 +45,14 @@ class InsertUser(BaseModel):
 class UserLogin(BaseModel):
     email: str
     password: str
+
+
+class CurrentUser(BaseModel):
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    phone_number: Optional[str] = None
+    degree: Optional[int] = None
+    email: Optional[str] = None
+    user_photo: Optional[str] = None
+    status: Optional[bool] = False
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.revoked = {}
+        self.revoked_users = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(token: str):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self.get_key(token)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if (
+                expires_at <= now
+                or payload.get("jti") in self.revoked
+                or self._is_user_revoked(payload, now)
+            ):
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def set(self, token: str, payload: dict):
+        expires_at = payload.get("exp")
+        if expires_at is None:
+            return
+        # other workers may revoke the token, so entries are rechecked regularly
+        expires_at = min(expires_at, time.time() + self.ttl)
+        with self.lock:
+            self.entries[self.get_key(token)] = (payload, expires_at)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def revoke(self, jti: str, expires_at: float = None):
+        now = time.time()
+        with self.lock:
+            self.revoked = {
+                key: value for key, value in self.revoked.items() if value > now
+            }
+            # keep the jti blocked until the token would have expired anyway
+            self.revoked[jti] = expires_at if expires_at is not None else float("inf")
+
+    def revoke_user(self, user_id, revoked_before: int, expires_at: float):
+        now = time.time()
+        with self.lock:
+            self.revoked_users = {
+                key: value
+                for key, value in self.revoked_users.items()
+                if value[1] > now
+            }
+            self.revoked_users[user_id] = (revoked_before, expires_at)
+
+    def _is_user_revoked(self, payload: dict, now: float):
+        entry = self.revoked_users.get(payload.get("user_id"))
+        if entry is None or entry[1] <= now:
+            return False
+        # iat has whole seconds, a token from the same second is revoked too
+        return payload.get("iat", 0) <= entry[0]
+
+    def is_user_revoked(self, payload: dict):
+        with self.lock:
+            return self._is_user_revoked(payload, time.time())
+
+    def is_revoked(self, jti: str):
+        with self.lock:
+            return jti in self.revoked
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revoked": len(self.revoked),
+            }
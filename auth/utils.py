@@ -1,30 +1,40 @@
 import os
-import smtplib
-from email.message import EmailMessage
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import jwt
 import secrets
 import starlette.status as status
 import random
+import time
 
 from datetime import *
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from database import get_async_session
 from models.models import Users
+from redis_client import redis_store
 from settings import (
-    mail_username,
-    mail_server,
-    mail_port,
-    mail_password,
+    TOKEN_CACHE_SIZE,
+    TOKEN_CACHE_TTL,
+    REFRESH_TOKEN_LIFETIME,
+    USER_CACHE_TTL,
+    USER_CACHE_SIZE,
 )
+from .emails import email_templates
+from .mail import enqueue_mail, enqueue_mails
+from .schemas import CurrentUser
+from .token_cache import TokenCache
+from .user_cache import UserCache
 
 load_dotenv()
 secret_key = os.environ.get("SECRET_KEY")
 algorithm = "HS256"
 security = HTTPBearer()
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+user_cache = UserCache(USER_CACHE_TTL, USER_CACHE_SIZE)
 
 
 def generate_token(user_id: int):
@@ -32,13 +42,15 @@ def generate_token(user_id: int):
     jti_refresh = str(secrets.token_urlsafe(32))
     data_access_token = {
         "token_type": "access",
+        "iat": datetime.utcnow(),
         "exp": datetime.utcnow() + timedelta(days=7),
         "user_id": user_id,
         "jti": jti_access,
     }
     data_refresh_token = {
         "token_type": "refresh",
-        "exp": datetime.utcnow() + timedelta(days=30),
+        "iat": datetime.utcnow(),
+        "exp": datetime.utcnow() + timedelta(seconds=REFRESH_TOKEN_LIFETIME),
         "user_id": user_id,
         "jti": jti_refresh,
     }
@@ -48,10 +60,53 @@ def generate_token(user_id: int):
     return {"access_token": access_token, "refresh_token": refresh_token}
 
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def is_token_revoked(payload: dict):
+    jti = payload.get("jti")
+    if token_cache.is_revoked(jti) or token_cache.is_user_revoked(payload):
+        return True
+    # revocations live in redis so every worker sees them, restarts included
+    if await redis_store.get(f"revoked:{jti}") is not None:
+        token_cache.revoke(jti, payload.get("exp"))
+        return True
+    revoked_before = await redis_store.get(f"revoked_before:{payload.get('user_id')}")
+    # iat has whole seconds, a token from the same second is revoked too
+    return revoked_before is not None and payload.get("iat", 0) <= int(revoked_before)
+
+
+async def decode_token(token: str):
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, secret_key, algorithms=[algorithm])
+        if await is_token_revoked(payload):
+            raise jwt.InvalidTokenError("Token has been revoked")
+        token_cache.set(token, payload)
+    return dict(payload)
+
+
+async def revoke_token(payload: dict):
+    jti = payload.get("jti")
+    ttl = int(payload.get("exp", 0) - time.time()) + 1
+    if ttl > 0:
+        await redis_store.set(f"revoked:{jti}", 1, ttl=ttl)
+    token_cache.revoke(jti, payload.get("exp"))
+
+
+async def revoke_user_tokens(user_id: int):
+    # every token issued up to now is rejected until the longest one expires
+    revoked_before = int(time.time())
+    await redis_store.set(
+        f"revoked_before:{user_id}", revoked_before, ttl=REFRESH_TOKEN_LIFETIME
+    )
+    # this worker drops cached tokens now, others on their next recheck
+    token_cache.revoke_user(
+        user_id, revoked_before, revoked_before + REFRESH_TOKEN_LIFETIME
+    )
+
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         token = credentials.credentials
-        payload = jwt.decode(token, secret_key, algorithms=[algorithm])
+        payload = await decode_token(token)
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -65,57 +120,30 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
 
 
 def get_email_objects(user_email, password: str):
-    email = EmailMessage()
-    email["Subject"] = f"Introducing"
-    email["From"] = mail_username
-    email["To"] = user_email
-
-    email.set_content(
-        f"""
-        <html>
-        <head>
-            <style>
-                .email-body {{
-                    font-family: Arial, sans-serif;
-                    font-size: 16px;
-                    line-height: 1.6;
-                    padding: 20px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="email-body">
-                <p>Assalomu alaykum,</p>
-
-                <p>Tabriklaymiz! Siz The Wolf ilovasiga muvaffaqiyatli ro'yxatdan o'tdingiz!</p>
-
-                <p>The Wolf ilovasi sizga o'z ta'lim va o'quv jarayonlaringizni boshlashda va barcha o'quv materiallariga kirishda yordam beradi.</p>
-
-                <p>Boshlash uchun, quyidagi havolani bosing va dasturni yuklab oling</p>
-
-                <p><a href="https://play.google.com/store/apps/details?id=com.tencent.ig">App Store</a> | <a href="https://play.google.com/store/apps/details?id=com.tencent.ig">Google Play</a></p>
-                    
-                <p>Va ro'yxatdan o'ting</p>
-                <p>🔑 Login: {user_email}</p>
-                <p>🔒 Parol: {password}</p>
-                
-                <p>Omad !</p>
-
-                <p>Hasan<br>SEO<br>The Wolf (Miilliard)</p>
-            </div>
-        </body>
-        </html>
-        """,
-        subtype="html",
+    return email_templates.build_message(
+        "welcome.html",
+        "Introducing",
+        user_email,
+        user_email=user_email,
+        password=password,
     )
-    return email
 
 
-def send_mail(email: str, password: str):
+def get_bulk_email_objects(users: list):
+    return email_templates.build_messages(
+        "welcome.html",
+        "Introducing",
+        [{"user_email": email, "password": password} for email, password in users],
+    )
+
+
+async def send_mail(session, email: str, password: str):
     email = get_email_objects(email, password)
-    with smtplib.SMTP_SSL(mail_server, mail_port) as server:
-        server.login(mail_username, mail_password)
-        server.send_message(email)
+    await enqueue_mail(session, email)
+
+
+async def send_bulk_mail(session, users: list):
+    await enqueue_mails(session, get_bulk_email_objects(users))
 
 
 def generate_six_numbers_code():
@@ -126,80 +154,19 @@ def generate_six_numbers_code():
 
 
 def get_email_objects_for_forget_password(user_email: str, code: int, first_name: str):
-    email = EmailMessage()
-    email["Subject"] = f"Change Password"
-    email["From"] = mail_username
-    email["To"] = user_email
-
-    email.set_content(
-        f"""
-            <html>
-<head>
-    <style>
-        body {{
-            font-family: Arial, sans-serif;
-            background-color: #f4f4f4;
-            color: #333;
-            margin: 0;
-            padding: 0;
-        }}
-        .container {{
-            max-width: 600px;
-            margin: 20px auto;
-            padding: 20px;
-            background-color: #fff;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        }}
-        h1 {{
-            color: #333;
-            text-align: center;
-        }}
-        p {{
-            margin-bottom: 20px;
-            line-height: 1.6;
-        }}
-        .code {{
-            background-color: #f0f0f0;
-            padding: 10px 20px;
-            border-radius: 6px;
-            text-align: center;
-            font-size: 24px;
-            margin: 20px 0;
-        }}
-        .footer {{
-            text-align: center;
-            margin-top: 20px;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>Salom {first_name}</h1>
-        <p>Parolingizni tiklash uchun quyidagi kodni kiriting:</p>
-        <div class="code">{code}</div>
-        <div class="footer">
-            <p>Rahmat,</p>
-            <p>The Wolf Jamoasi</p>
-        </div>
-
-        <p align='center'><a href="https://play.google.com/store/apps/details?id=com.tencent.ig">App Store</a> | <a href="https://play.google.com/store/apps/details?id=com.tencent.ig">Google Play</a></p>
-    </div>
-</body>
-</html>
-
-        """,
-        subtype="html",
+    return email_templates.build_message(
+        "forget_password.html",
+        "Change Password",
+        user_email,
+        code=code,
+        first_name=first_name,
     )
-    return email
 
 
-def send_mail_for_forget_password(email: str, first_name: str):
+async def send_mail_for_forget_password(session, email: str, first_name: str):
     code = generate_six_numbers_code()
     email = get_email_objects_for_forget_password(email, code, first_name)
-    with smtplib.SMTP_SSL(mail_server, mail_port) as server:
-        server.login(mail_username, mail_password)
-        server.send_message(email)
+    await enqueue_mail(session, email)
     return code
 
 
@@ -208,3 +175,23 @@ async def get_user_data(session, user_id):
     user__data = await session.execute(user_query)
     user_data = user__data.scalars().one()
     return user_data
+
+
+async def get_current_user(
+    token: dict = Depends(verify_token),
+    session: AsyncSession = Depends(get_async_session),
+):
+    user_id = token.get("user_id")
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    user_query = select(Users).where(Users.id == user_id)
+    user__data = await session.execute(user_query)
+    user_data = user__data.scalars().one_or_none()
+    if user_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    user = CurrentUser.model_validate(user_data, from_attributes=True)
+    user_cache.set(user_id, user)
+    return user
@@ -0,0 +1,94 @@
+import asyncio
+
+from sqlalchemy import insert
+
+from database import async_session_maker
+from models.models import Message
+from settings import (
+    CHAT_FLUSH_INTERVAL_MS,
+    CHAT_FLUSH_BATCH_SIZE,
+    CHAT_FLUSH_MAX_PENDING,
+)
+
+
+class BufferFull(Exception):
+    pass
+
+
+class MessageWriteBuffer:
+    def __init__(self, flush_interval_ms: int, batch_size: int, max_pending: int):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.pending = []
+        self.wakeup = None
+        self.task = None
+        self.flushed = 0
+        self.batches = 0
+        self.rejected = 0
+
+    def start(self):
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        while self.pending:
+            await self.flush()
+
+    def submit(self, values: dict):
+        if len(self.pending) >= self.max_pending:
+            # the database is behind, shed load instead of growing without bound
+            self.rejected += 1
+            raise BufferFull("Too many messages waiting to be saved")
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((values, future))
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+        return future
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            while self.pending:
+                await self.flush()
+
+    async def flush(self):
+        batch = self.pending[: self.batch_size]
+        del self.pending[: self.batch_size]
+        if not batch:
+            return
+        try:
+            async with async_session_maker() as session:
+                query = insert(Message).returning(
+                    Message.id, sort_by_parameter_order=True
+                )
+                result = await session.execute(query, [values for values, _ in batch])
+                ids = result.scalars().all()
+                await session.commit()
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.flushed += len(batch)
+        self.batches += 1
+        for (_, future), message_id in zip(batch, ids):
+            if not future.done():
+                future.set_result(message_id)
+
+
+message_buffer = MessageWriteBuffer(
+    CHAT_FLUSH_INTERVAL_MS, CHAT_FLUSH_BATCH_SIZE, CHAT_FLUSH_MAX_PENDING
+)
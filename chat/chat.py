@@ -1,66 +1,245 @@
-import base64
-import hashlib
+import asyncio
 import json
+import mimetypes
+import os
+import uuid
 
-from typing import List, Dict
+from datetime import datetime
 
-from sqlalchemy import insert, select
+from typing import List, Dict, Optional
 
-from models.models import Message, Users, Room
-from .scheme import MessageScheme, ReceiverScheme, MessageShowScheme
-from auth.schemas import UserInfo
-from sqlalchemy.exc import NoResultFound
+import jwt
+from sqlalchemy import insert, select, func, tuple_
+
+from models.models import Message, ChatFile
+from .scheme import (
+    MessageScheme,
+    ReceiverScheme,
+    RoomScheme,
+    ConversationScheme,
+    ReadScheme,
+    MessageShowScheme,
+    MessagePageScheme,
+)
+from .buffer import message_buffer, BufferFull
+from .hub import create_hub
+from .conversations import get_conversations_query, mark_conversation_read
+from .rooms import get_room_by_key, get_room_key, get_or_create_pair_room
+from .utils import encode_cursor, decode_cursor, parse_message_frame
+from auth.directory import get_user_directory
+from auth.schemas import DirectoryPage
 from sqlalchemy.ext.asyncio import AsyncSession
-from auth.utils import verify_token
-from database import get_async_session
+from auth.utils import verify_token, decode_token
+from database import get_async_session, async_session_maker
+from files.storage import storage
+from files.uploads import save_stream, file_too_large
+from settings import (
+    CHAT_PAGE_SIZE,
+    CHAT_MAX_PAGE_SIZE,
+    CHAT_FILES_DIR,
+    UPLOAD_TMP_DIR,
+    CHAT_MAX_FILE_SIZE,
+    CHAT_MAX_IN_FLIGHT,
+    DIRECTORY_PAGE_SIZE,
+)
 from starlette import status
 from starlette.websockets import WebSocketDisconnect
-from fastapi import WebSocket, APIRouter, Depends
+from fastapi import WebSocket, APIRouter, Depends, Request
 from fastapi.exceptions import HTTPException
 
 chat_router = APIRouter()
+manager = create_hub()
 
 
-class WebSocketManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket, room: str):
-        if len(self.active_connections) < 2:
-            await websocket.accept()
-            self.active_connections.append({"socket": websocket, "room": room})
-
-    async def disconnect(self, websocket: WebSocket):
-        for connection in self.active_connections:
-            if connection["socket"] == websocket:
-                self.active_connections.remove(connection)
-                break
+def send_error(connection, client_id, detail: str):
+    error_frame = {"type": "error", "client_id": client_id, "detail": detail}
+    manager.send(connection, json.dumps(error_frame))
 
-    async def broadcast(self, message: str, room: str):
-        for connection in self.active_connections:
-            if connection["room"] == room:
-                await connection["socket"].send_text(message)
 
-
-manager = WebSocketManager()
+async def persist_and_acknowledge(
+    connection, room: str, values: dict, client_id, in_flight
+):
+    try:
+        message_id = await message_buffer.submit(values)
+    except BufferFull:
+        send_error(connection, client_id, "Server is busy, try again later")
+        return
+    except Exception:
+        send_error(connection, client_id, "Message could not be saved")
+        return
+    finally:
+        in_flight.release()
+    ack_frame = {"type": "ack", "client_id": client_id, "id": message_id}
+    manager.send(connection, json.dumps(ack_frame))
+    message_frame = {
+        "type": "message",
+        "id": message_id,
+        "sender_id": values["sender_id"],
+        "receiver_id": values["receiver_id"],
+        "message": values["message"],
+        "sent_at": values["sent_at"].isoformat(),
+    }
+    await manager.broadcast(json.dumps(message_frame), room)
 
 
 @chat_router.websocket("/ws/{room}")
-async def websocket_endpoint(websocket: WebSocket, room: str):
-    await manager.connect(websocket, room)
+async def websocket_endpoint(websocket: WebSocket, room: str, token: str = None):
+    try:
+        payload = await decode_token(token) if token else None
+    except jwt.InvalidTokenError:
+        payload = None
+    if payload is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user_id = payload.get("user_id")
+    async with async_session_maker() as session:
+        room_data = await get_room_by_key(session, room)
+    if room_data is None or user_id not in (room_data.sender_id, room_data.receiver_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    if room_data.sender_id == user_id:
+        receiver_id = room_data.receiver_id
+    else:
+        receiver_id = room_data.sender_id
+
+    connection = await manager.connect(websocket, room)
+    # bounds the messages one socket can have waiting for the write buffer
+    in_flight = asyncio.Semaphore(CHAT_MAX_IN_FLIGHT)
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.broadcast(data, room)
-    except WebSocketDisconnect:
+            frame = parse_message_frame(data)
+            client_id = frame.get("client_id")
+            text = frame.get("message")
+            if frame.get("type", "message") != "message" or not isinstance(text, str):
+                send_error(connection, client_id, "Unsupported frame")
+                continue
+            if in_flight.locked():
+                send_error(connection, client_id, "Too many messages in flight")
+                continue
+            await in_flight.acquire()
+            values = {
+                "sender_id": user_id,
+                "receiver_id": receiver_id,
+                "message": text,
+                "sent_at": datetime.utcnow(),
+            }
+            manager.spawn(
+                persist_and_acknowledge(connection, room, values, client_id, in_flight)
+            )
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
         await manager.disconnect(websocket)
 
 
+@chat_router.get("/ws/stats")
+async def get_websocket_stats(token: dict = Depends(verify_token)):
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
+        )
+    return manager.get_stats()
+
+
+async def get_member_room(session: AsyncSession, room: str, user_id: int):
+    room_data = await get_room_by_key(session, room)
+    if room_data is None or user_id not in (room_data.sender_id, room_data.receiver_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="You are not in this room"
+        )
+    return room_data
+
+
 @chat_router.post("/ws/send-file")
-async def send_file(file_data: bytes, room: str):
-    base64_data = base64.b64encode(file_data).decode("utf-8")
-    await manager.broadcast(base64_data, room)
-    return {"message": "File sent"}
+async def send_file(
+    request: Request,
+    room: str,
+    filename: str,
+    token: dict = Depends(verify_token),
+    session: AsyncSession = Depends(get_async_session),
+):
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
+        )
+    sender_id = token.get("user_id")
+    await get_member_room(session, room, sender_id)
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > CHAT_MAX_FILE_SIZE:
+            raise file_too_large(CHAT_MAX_FILE_SIZE)
+    filename = os.path.basename(filename)
+    _, extension = os.path.splitext(filename)
+    temp_path = os.path.join(UPLOAD_TMP_DIR, uuid.uuid4().hex)
+    saved_file = await save_stream(request.stream(), temp_path, CHAT_MAX_FILE_SIZE)
+    size = saved_file.size
+    path = os.path.join(CHAT_FILES_DIR, f"{uuid.uuid4().hex}{extension.lower()}")
+    try:
+        await storage.put(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    mime = request.headers.get("content-type")
+    if not mime or mime == "application/octet-stream":
+        mime = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    try:
+        query = (
+            insert(ChatFile)
+            .values(
+                room=room,
+                sender_id=sender_id,
+                filename=filename,
+                mime=mime,
+                size=size,
+                path=path,
+                sent_at=datetime.utcnow(),
+            )
+            .returning(ChatFile.id)
+        )
+        file__data = await session.execute(query)
+        file_id = file__data.scalar_one()
+        await session.commit()
+    except Exception as e:
+        await storage.delete(path)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    file_frame = {
+        "type": "file",
+        "id": file_id,
+        "sender_id": sender_id,
+        "filename": filename,
+        "size": size,
+        "mime": mime,
+        "url": f"/chat/ws/files/{file_id}",
+    }
+    await manager.broadcast(json.dumps(file_frame), room)
+    return file_frame
+
+
+@chat_router.get("/ws/files/{file_id}")
+async def get_file(
+    file_id: int,
+    request: Request,
+    token: dict = Depends(verify_token),
+    session: AsyncSession = Depends(get_async_session),
+):
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
+        )
+    file__data = await session.execute(select(ChatFile).where(ChatFile.id == file_id))
+    file_data = file__data.scalars().one_or_none()
+    if file_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="File not found"
+        )
+    await get_member_room(session, file_data.room, token.get("user_id"))
+    return await storage.download_response(
+        request, file_data.path, file_data.filename, file_data.mime
+    )
 
 
 @chat_router.post("/ws/send-message")
@@ -91,8 +270,12 @@ async def send_message(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@chat_router.get("/ws/get-users", response_model=List[UserInfo])
+@chat_router.get("/ws/get-users", response_model=DirectoryPage)
 async def get_users(
+    limit: int = DIRECTORY_PAGE_SIZE,
+    after: Optional[int] = None,
+    search: Optional[str] = None,
+    degree: Optional[int] = None,
     token: dict = Depends(verify_token),
     session: AsyncSession = Depends(get_async_session),
 ):
@@ -102,15 +285,12 @@ async def get_users(
         )
     user_id = token.get("user_id")
     try:
-        query = select(Users).where(Users.id != user_id)
-        user__data = await session.execute(query)
-        user_datas = user__data.scalars().all()
-        return user_datas
+        return await get_user_directory(session, user_id, limit, after, search, degree)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@chat_router.post("/ws/room", response_model=None)
+@chat_router.post("/ws/room", response_model=RoomScheme)
 async def get_or_create_room(
     receiver: ReceiverScheme,
     token: dict = Depends(verify_token),
@@ -122,45 +302,67 @@ async def get_or_create_room(
         )
     sender_id = token.get("user_id")
     try:
-        room_data = {"sender_id": sender_id, "receiver_id": receiver.receiver_id}
-        dump_data = json.dumps(room_data)
-        hash_object = hashlib.sha256(dump_data.encode())
-        unique_code = hash_object.hexdigest()
-        query_get = select(Room).where(
-            ((Room.sender_id == sender_id) & (Room.receiver_id == receiver.receiver_id))
-            | (
-                (Room.sender_id == receiver.receiver_id)
-                & (Room.receiver_id == sender_id)
-            )
+        return await get_or_create_pair_room(
+            session, sender_id, receiver.receiver_id
         )
-        room_data = await session.execute(query_get)
-        try:
-            result = room_data.scalars().one()
-        except NoResultFound:
-            try:
-                query = insert(Room).values(
-                    key=unique_code,
-                    sender_id=sender_id,
-                    receiver_id=receiver.receiver_id,
-                )
-                await session.execute(query)
-                await session.commit()
-
-                result_query = select(Room).where(Room.key == unique_code)
-                result_data = await session.execute(result_query)
-                result = result_data.scalars().one()
-            except Exception as e:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
-                )
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    return result
 
 
-@chat_router.post("/ws/messages", response_model=List[MessageShowScheme])
+@chat_router.get("/ws/conversations", response_model=List[ConversationScheme])
+async def get_conversations(
+    limit: int = CHAT_PAGE_SIZE,
+    offset: int = 0,
+    token: dict = Depends(verify_token),
+    session: AsyncSession = Depends(get_async_session),
+):
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
+        )
+    limit = max(1, min(limit, CHAT_MAX_PAGE_SIZE))
+    user_id = token.get("user_id")
+    try:
+        query = get_conversations_query(user_id, limit, max(offset, 0))
+        conversation__data = await session.execute(query)
+        return [
+            ConversationScheme.model_validate(row, from_attributes=True)
+            for row in conversation__data.all()
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@chat_router.post("/ws/read")
+async def mark_messages_read(
+    read: ReadScheme,
+    token: dict = Depends(verify_token),
+    session: AsyncSession = Depends(get_async_session),
+):
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
+        )
+    user_id = token.get("user_id")
+    try:
+        message_id = await mark_conversation_read(
+            session, user_id, read.receiver_id, read.message_id
+        )
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    read_frame = {"type": "read", "reader_id": user_id, "message_id": message_id}
+    await manager.broadcast(
+        json.dumps(read_frame), get_room_key(user_id, read.receiver_id)
+    )
+    return {"success": True, "message_id": message_id}
+
+
+@chat_router.post("/ws/messages", response_model=MessagePageScheme)
 async def get_chat_messages(
     receiver_id: int,
+    limit: int = CHAT_PAGE_SIZE,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
     token: dict = Depends(verify_token),
     session: AsyncSession = Depends(get_async_session),
 ):
@@ -168,14 +370,50 @@ async def get_chat_messages(
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
         )
+    if before and after:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either before or after, not both",
+        )
+    limit = max(1, min(limit, CHAT_MAX_PAGE_SIZE))
+    sender_id = token.get("user_id")
     try:
-        sender_id = token.get("user_id")
+        low_id, high_id = min(sender_id, receiver_id), max(sender_id, receiver_id)
+        # matches the expression index on the normalized user pair
         query = select(Message).where(
-            ((Message.sender_id == sender_id) & (Message.receiver_id == receiver_id))
-            | ((Message.sender_id == receiver_id) & (Message.receiver_id == sender_id))
+            (func.least(Message.sender_id, Message.receiver_id) == low_id)
+            & (func.greatest(Message.sender_id, Message.receiver_id) == high_id)
         )
-        message_data = await session.execute(query)
-        result = message_data.scalars().all()
-        return result
+        if after:
+            sent_at, message_id = decode_cursor(after)
+            query = query.where(
+                tuple_(Message.sent_at, Message.id) > tuple_(sent_at, message_id)
+            ).order_by(Message.sent_at.asc(), Message.id.asc())
+        else:
+            if before:
+                sent_at, message_id = decode_cursor(before)
+                query = query.where(
+                    tuple_(Message.sent_at, Message.id) < tuple_(sent_at, message_id)
+                )
+            query = query.order_by(Message.sent_at.desc(), Message.id.desc())
+        message_data = await session.execute(query.limit(limit + 1))
+        messages = message_data.scalars().all()
+        has_more = len(messages) > limit
+        messages = [
+            MessageShowScheme.model_validate(message, from_attributes=True)
+            for message in messages[:limit]
+        ]
+        if not after:
+            messages.reverse()
+
+        page = MessagePageScheme(messages=messages, has_more=has_more)
+        if messages:
+            page.before = encode_cursor(messages[0].sent_at, messages[0].id)
+            page.after = encode_cursor(messages[-1].sent_at, messages[-1].id)
+        else:
+            page.before, page.after = before, after
+        return page
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from sqlalchemy import select, func, case, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from models.models import Message, MessageRead, Users
+
+
+def get_conversations_query(user_id: int, limit: int, offset: int = 0):
+    peer_id = case(
+        (Message.sender_id == user_id, Message.receiver_id),
+        else_=Message.sender_id,
+    )
+    is_unread = (Message.receiver_id == user_id) & (
+        Message.id > func.coalesce(MessageRead.last_read_message_id, 0)
+    )
+    # one pass over the user's messages: the newest row of every peer
+    # carries the unread total of its partition
+    messages = (
+        select(
+            peer_id.label("peer_id"),
+            Message.id,
+            Message.sender_id,
+            Message.message,
+            Message.sent_at,
+            func.row_number()
+            .over(
+                partition_by=peer_id,
+                order_by=(Message.sent_at.desc(), Message.id.desc()),
+            )
+            .label("position"),
+            func.count()
+            .filter(is_unread)
+            .over(partition_by=peer_id)
+            .label("unread_count"),
+        )
+        .outerjoin(
+            MessageRead,
+            (MessageRead.user_id == user_id) & (MessageRead.peer_id == peer_id),
+        )
+        .where(or_(Message.sender_id == user_id, Message.receiver_id == user_id))
+        .subquery()
+    )
+    return (
+        select(
+            messages.c.peer_id,
+            Users.first_name,
+            Users.last_name,
+            Users.user_photo,
+            messages.c.id.label("last_message_id"),
+            messages.c.message.label("last_message"),
+            messages.c.sender_id.label("last_sender_id"),
+            messages.c.sent_at.label("last_sent_at"),
+            messages.c.unread_count,
+        )
+        .outerjoin(Users, Users.id == messages.c.peer_id)
+        .where(messages.c.position == 1)
+        .order_by(messages.c.sent_at.desc(), messages.c.id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+async def mark_conversation_read(session, user_id: int, peer_id: int, message_id=None):
+    if message_id is None:
+        last_message = await session.execute(
+            select(func.max(Message.id)).where(
+                (Message.sender_id == peer_id) & (Message.receiver_id == user_id)
+            )
+        )
+        message_id = last_message.scalar() or 0
+    query = insert(MessageRead).values(
+        user_id=user_id,
+        peer_id=peer_id,
+        last_read_message_id=message_id,
+        read_at=datetime.utcnow(),
+    )
+    # receipts only move forward, late or repeated calls are harmless
+    query = query.on_conflict_do_update(
+        constraint="uq_message_reads",
+        set_={
+            "last_read_message_id": func.greatest(
+                MessageRead.last_read_message_id, query.excluded.last_read_message_id
+            ),
+            "read_at": query.excluded.read_at,
+        },
+    )
+    await session.execute(query)
+    await session.commit()
+    return message_id
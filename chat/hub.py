@@ -0,0 +1,176 @@
+import asyncio
+import os
+from collections import defaultdict
+
+import redis.asyncio as aioredis
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+
+from settings import REDIS_URL, CHAT_SEND_QUEUE_SIZE, CHAT_BACKPLANE
+
+
+class Connection:
+    def __init__(self, websocket: WebSocket, room: str, queue_size: int):
+        self.websocket = websocket
+        self.room = room
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.sender = None
+
+
+class RedisBackplane:
+    channel_prefix = "chat:"
+
+    def __init__(self, url: str):
+        self.url = url
+        self.client = None
+        self.pubsub = None
+        self.listener = None
+        self.hub = None
+
+    async def start(self, hub):
+        self.hub = hub
+        self.client = aioredis.from_url(self.url, decode_responses=True)
+        self.pubsub = self.client.pubsub()
+        self.listener = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self.listener is not None:
+            self.listener.cancel()
+            try:
+                await self.listener
+            except asyncio.CancelledError:
+                pass
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def subscribe(self, room: str):
+        await self.pubsub.subscribe(f"{self.channel_prefix}{room}")
+
+    async def unsubscribe(self, room: str):
+        await self.pubsub.unsubscribe(f"{self.channel_prefix}{room}")
+
+    async def publish(self, room: str, message: str):
+        await self.client.publish(f"{self.channel_prefix}{room}", message)
+
+    async def listen(self):
+        while True:
+            if not self.pubsub.subscribed:
+                await asyncio.sleep(0.1)
+                continue
+            try:
+                message = await self.pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Chat backplane error: {e}")
+                await asyncio.sleep(1)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            room = message["channel"][len(self.channel_prefix) :]
+            self.hub.deliver(room, message["data"])
+
+
+class WebSocketHub:
+    def __init__(self, queue_size: int, backplane: RedisBackplane = None):
+        self.queue_size = queue_size
+        self.backplane = backplane
+        self.rooms = defaultdict(set)
+        self.connections = {}
+        self.dropped = 0
+        self.tasks = set()
+
+    async def start(self):
+        if self.backplane is not None:
+            await self.backplane.start(self)
+
+    async def stop(self):
+        for connection in list(self.connections.values()):
+            await self.close(connection)
+        if self.backplane is not None:
+            await self.backplane.stop()
+
+    async def connect(self, websocket: WebSocket, room: str):
+        await websocket.accept()
+        connection = Connection(websocket, room, self.queue_size)
+        is_new_room = room not in self.rooms
+        self.rooms[room].add(connection)
+        self.connections[websocket] = connection
+        connection.sender = asyncio.create_task(self.send_loop(connection))
+        if is_new_room and self.backplane is not None:
+            await self.backplane.subscribe(room)
+        return connection
+
+    async def disconnect(self, websocket: WebSocket):
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return
+        room_connections = self.rooms.get(connection.room)
+        if room_connections is not None:
+            room_connections.discard(connection)
+            if not room_connections:
+                del self.rooms[connection.room]
+                if self.backplane is not None:
+                    await self.backplane.unsubscribe(connection.room)
+        sender = connection.sender
+        if sender is not None and sender is not asyncio.current_task():
+            sender.cancel()
+
+    async def close(self, connection: Connection, code: int = 1000):
+        await self.disconnect(connection.websocket)
+        if connection.websocket.application_state == WebSocketState.CONNECTED:
+            try:
+                await connection.websocket.close(code=code)
+            except RuntimeError:
+                pass
+
+    async def send_loop(self, connection: Connection):
+        try:
+            while True:
+                message = await connection.queue.get()
+                await connection.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await self.disconnect(connection.websocket)
+
+    async def broadcast(self, message: str, room: str):
+        if self.backplane is not None:
+            await self.backplane.publish(room, message)
+        else:
+            self.deliver(room, message)
+
+    def deliver(self, room: str, message: str):
+        for connection in list(self.rooms.get(room, ())):
+            self.send(connection, message)
+
+    def send(self, connection: Connection, message: str):
+        try:
+            connection.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # a client that cannot keep up must not stall the rest of the room
+            self.dropped += 1
+            self.spawn(self.close(connection, code=1013))
+
+    def spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def get_stats(self):
+        return {
+            "rooms": len(self.rooms),
+            "connections": len(self.connections),
+            "dropped": self.dropped,
+            "worker_pid": os.getpid(),
+        }
+
+
+def create_hub():
+    backplane = RedisBackplane(REDIS_URL) if CHAT_BACKPLANE == "redis" else None
+    return WebSocketHub(CHAT_SEND_QUEUE_SIZE, backplane)
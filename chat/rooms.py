@@ -0,0 +1,69 @@
+import hashlib
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from auth.user_cache import UserCache
+from models.models import Room
+from settings import ROOM_CACHE_TTL, ROOM_CACHE_SIZE
+from .scheme import RoomScheme
+
+# rooms are never edited once created, so entries are cached both by the
+# normalized user pair and by key
+room_cache = UserCache(ROOM_CACHE_TTL, ROOM_CACHE_SIZE)
+
+
+def get_room_pair(user_id: int, other_id: int):
+    return min(user_id, other_id), max(user_id, other_id)
+
+
+def get_room_key(user_id: int, other_id: int):
+    low_id, high_id = get_room_pair(user_id, other_id)
+    dump_data = json.dumps({"sender_id": low_id, "receiver_id": high_id})
+    return hashlib.sha256(dump_data.encode()).hexdigest()
+
+
+def cache_room(room: RoomScheme):
+    room_cache.set(get_room_pair(room.sender_id, room.receiver_id), room)
+    room_cache.set(room.key, room)
+    return room
+
+
+async def get_room_by_key(session, key: str):
+    room = room_cache.get(key)
+    if room is not None:
+        return room
+    room__data = await session.execute(select(Room).where(Room.key == key))
+    room_data = room__data.scalars().one_or_none()
+    if room_data is None:
+        return None
+    return cache_room(RoomScheme.model_validate(room_data, from_attributes=True))
+
+
+async def get_or_create_pair_room(session, sender_id: int, receiver_id: int):
+    room = room_cache.get(get_room_pair(sender_id, receiver_id))
+    if room is not None:
+        return room
+    key = get_room_key(sender_id, receiver_id)
+    columns = (Room.id, Room.key, Room.sender_id, Room.receiver_id, Room.created_at)
+    query = (
+        insert(Room)
+        .values(
+            key=key,
+            sender_id=sender_id,
+            receiver_id=receiver_id,
+            created_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=[Room.key])
+        .returning(*columns)
+    )
+    room__data = await session.execute(query)
+    row = room__data.one_or_none()
+    if row is None:
+        # the other user created the room first
+        room__data = await session.execute(select(*columns).where(Room.key == key))
+        row = room__data.one()
+    await session.commit()
+    return cache_room(RoomScheme.model_validate(row, from_attributes=True))
@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
@@ -15,6 +18,7 @@ class RoomScheme(BaseModel):
     key: str
     sender_id: int
     receiver_id: int
+    created_at: Optional[datetime] = None
 
 
 class MessageShowScheme(BaseModel):
@@ -22,3 +26,28 @@ class MessageShowScheme(BaseModel):
     message: str
     sender_id: int
     receiver_id: int
+    sent_at: Optional[datetime] = None
+
+
+class MessagePageScheme(BaseModel):
+    messages: List[MessageShowScheme]
+    before: Optional[str] = None
+    after: Optional[str] = None
+    has_more: bool
+
+
+class ConversationScheme(BaseModel):
+    peer_id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    user_photo: Optional[str] = None
+    last_message_id: int
+    last_message: Optional[str] = None
+    last_sender_id: int
+    last_sent_at: Optional[datetime] = None
+    unread_count: int
+
+
+class ReadScheme(BaseModel):
+    receiver_id: int
+    message_id: Optional[int] = None
@@ -0,0 +1,33 @@
+import base64
+import json
+from datetime import datetime
+
+import starlette.status as status
+from fastapi.exceptions import HTTPException
+
+
+def encode_cursor(sent_at: datetime, message_id: int):
+    raw = f"{sent_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        sent_at, message_id = raw.split("|")
+        return datetime.fromisoformat(sent_at), int(message_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def parse_message_frame(data: str):
+    try:
+        frame = json.loads(data)
+    except ValueError:
+        frame = None
+    if not isinstance(frame, dict):
+        # plain text frames from older clients are treated as chat messages
+        return {"type": "message", "message": data}
+    return frame
@@ -1,7 +1,12 @@
+import time
 from typing import AsyncGenerator
+
+from fastapi import Depends
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from settings import (
     POSTGRES_DB,
@@ -9,15 +14,117 @@ from settings import (
     POSTGRES_HOST,
     POSTGRES_PORT,
     POSTGRES_USER,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_PREPARED_STATEMENT_CACHE_SIZE,
+    DB_STATEMENT_TIMEOUT_DEFAULT,
 )
 
 DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 Base = declarative_base()
 
-engine = create_async_engine(DATABASE_URL)
-async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+class PoolWaitStats:
+    def __init__(self):
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def record(self, wait_time: float, timed_out: bool = False):
+        self.waits += 1
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        if timed_out:
+            self.timeouts += 1
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_wait_stats.record(time.perf_counter() - started_at, timed_out=True)
+            raise
+        pool_wait_stats.record(time.perf_counter() - started_at)
+        return connection
+
+
+def create_engine_from_settings():
+    return create_async_engine(
+        DATABASE_URL,
+        poolclass=InstrumentedPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={
+            "prepared_statement_cache_size": DB_PREPARED_STATEMENT_CACHE_SIZE,
+            # the default is set once per connection instead of per transaction
+            "server_settings": {
+                "statement_timeout": str(int(DB_STATEMENT_TIMEOUT_DEFAULT))
+            },
+        },
+    )
+
+
+class TimeoutSession(Session):
+    pass
+
+
+@event.listens_for(TimeoutSession, "after_begin")
+def set_statement_timeout(session, transaction, connection):
+    timeout = session.info.get("statement_timeout")
+    if timeout is not None and timeout != DB_STATEMENT_TIMEOUT_DEFAULT:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+
+engine = create_engine_from_settings()
+async_session_maker = sessionmaker(
+    engine,
+    class_=AsyncSession,
+    sync_session_class=TimeoutSession,
+    expire_on_commit=False,
+)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         yield session
+
+
+def statement_timeout(timeout_ms: int):
+    async def set_session_statement_timeout(
+        session: AsyncSession = Depends(get_async_session),
+    ):
+        session.info["statement_timeout"] = timeout_ms
+
+    return set_session_statement_timeout
+
+
+def get_pool_stats():
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "timeout": DB_POOL_TIMEOUT,
+        "waits": pool_wait_stats.waits,
+        "timeouts": pool_wait_stats.timeouts,
+        "avg_wait_ms": (
+            pool_wait_stats.total_wait_time / pool_wait_stats.waits * 1000
+            if pool_wait_stats.waits
+            else 0
+        ),
+        "max_wait_ms": pool_wait_stats.max_wait_time * 1000,
+    }
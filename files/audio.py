@@ -0,0 +1,173 @@
+import asyncio
+import sys
+from array import array
+
+from fastapi import UploadFile
+
+from settings import (
+    FFMPEG_PATH,
+    FILE_CHUNK_SIZE,
+    VOICE_OPUS_BITRATE,
+    VOICE_AUDIO_FILTER,
+    VOICE_WAVEFORM_POINTS,
+    VOICE_TRANSCODE_TIMEOUT,
+)
+
+AUDIO_EXTENSIONS = {
+    "audio/wav": ".wav",
+    "audio/mpeg": ".mp3",
+    "audio/aac": ".aac",
+    "audio/ogg": ".ogg",
+    "audio/flac": ".flac",
+    "audio/mp4": ".m4a",
+    "audio/amr": ".amr",
+    "audio/webm": ".webm",
+}
+
+SNIFF_SIZE = 12
+# peaks are taken from a low rate mono copy, 10ms per peak
+WAVEFORM_SAMPLE_RATE = 8000
+PEAK_WINDOW = WAVEFORM_SAMPLE_RATE // 100
+
+
+class AudioError(Exception):
+    pass
+
+
+def sniff_audio(header: bytes):
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "audio/wav"
+    if header[:4] == b"OggS":
+        return "audio/ogg"
+    if header[:4] == b"fLaC":
+        return "audio/flac"
+    if header[:3] == b"ID3":
+        return "audio/mpeg"
+    if len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        # mpeg frame sync, adts streams carry layer 0
+        return "audio/aac" if header[1] & 0x06 == 0 else "audio/mpeg"
+    if header[4:8] == b"ftyp":
+        return "audio/mp4"
+    if header[:6] == b"#!AMR\n":
+        return "audio/amr"
+    if header[:4] == b"\x1a\x45\xdf\xa3":
+        return "audio/webm"
+    return None
+
+
+async def sniff_upload(file: UploadFile):
+    header = await file.read(SNIFF_SIZE)
+    await file.seek(0)
+    return sniff_audio(header)
+
+
+def get_transcode_args(source_path: str, output_path: str):
+    filters = "aformat=channel_layouts=mono"
+    if VOICE_AUDIO_FILTER:
+        filters = f"{filters},{VOICE_AUDIO_FILTER}"
+    # one decode feeds both the opus file and the raw samples for the peaks
+    return [
+        FFMPEG_PATH,
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-y",
+        "-i",
+        source_path,
+        "-filter_complex",
+        f"[0:a:0]{filters},asplit=2[voice][peaks]",
+        "-map",
+        "[voice]",
+        "-map_metadata",
+        "-1",
+        "-c:a",
+        "libopus",
+        "-b:a",
+        VOICE_OPUS_BITRATE,
+        "-application",
+        "voip",
+        "-ar",
+        "48000",
+        "-f",
+        "ogg",
+        output_path,
+        "-map",
+        "[peaks]",
+        "-c:a",
+        "pcm_s16le",
+        "-ar",
+        str(WAVEFORM_SAMPLE_RATE),
+        "-f",
+        "s16le",
+        "pipe:1",
+    ]
+
+
+def get_peaks(data: bytes):
+    samples = array("h", data)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    peaks = []
+    for start in range(0, len(samples), PEAK_WINDOW):
+        window = samples[start : start + PEAK_WINDOW]
+        peaks.append(max(max(window), -min(window)))
+    return peaks, len(samples)
+
+
+async def read_peaks(stream):
+    peaks = []
+    sample_count = 0
+    rest = b""
+    while True:
+        chunk = await stream.read(FILE_CHUNK_SIZE)
+        if not chunk:
+            break
+        data = rest + chunk
+        usable = len(data) - len(data) % (PEAK_WINDOW * 2)
+        rest = data[usable:]
+        chunk_peaks, chunk_count = get_peaks(data[:usable])
+        peaks.extend(chunk_peaks)
+        sample_count += chunk_count
+    if len(rest) >= 2:
+        chunk_peaks, chunk_count = get_peaks(rest[: len(rest) // 2 * 2])
+        peaks.extend(chunk_peaks)
+        sample_count += chunk_count
+    return peaks, sample_count
+
+
+def get_waveform(peaks, points: int = VOICE_WAVEFORM_POINTS):
+    points = min(points, len(peaks))
+    if points == 0:
+        return []
+    buckets = [
+        max(peaks[index * len(peaks) // points : (index + 1) * len(peaks) // points])
+        for index in range(points)
+    ]
+    # scaled to the loudest bucket so quiet notes still draw a shape
+    loudest = max(buckets) or 1
+    return [round(peak * 100 / loudest) for peak in buckets]
+
+
+async def transcode_voice(source_path: str, output_path: str):
+    process = await asyncio.create_subprocess_exec(
+        *get_transcode_args(source_path, output_path),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        (peaks, sample_count), error = await asyncio.wait_for(
+            asyncio.gather(read_peaks(process.stdout), process.stderr.read()),
+            VOICE_TRANSCODE_TIMEOUT,
+        )
+        await process.wait()
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        message = error.decode(errors="replace").strip()[-500:]
+        raise AudioError(message or f"ffmpeg exited with {process.returncode}")
+    if sample_count == 0:
+        raise AudioError("No audio found in the voice message")
+    return sample_count / WAVEFORM_SAMPLE_RATE, get_waveform(peaks)
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.dialects.postgresql import insert
+
+from database import async_session_maker
+from models.models import Blob
+from settings import BLOBS_DIR, UPLOAD_TMP_DIR, UPLOAD_MAX_SIZE
+from .storage import storage
+from .uploads import save_upload
+
+
+def get_blob_path(checksum: str, extension: str = ""):
+    # two levels of sharding keep every directory small
+    return os.path.join(
+        BLOBS_DIR, checksum[:2], checksum[2:4], f"{checksum}{extension.lower()}"
+    )
+
+
+def get_blob_checksum(path: str):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def is_legacy_path(path: str):
+    # files uploaded before the blob store have no row and a single owner
+    return not path.startswith(BLOBS_DIR + os.sep)
+
+
+async def lock_blob(session, checksum: str):
+    # serializes store and collect of the same content until commit
+    await session.execute(select(func.pg_advisory_xact_lock(func.hashtext(checksum))))
+
+
+async def store_blob(
+    session, file, max_size: int = UPLOAD_MAX_SIZE, extension: str = None
+):
+    if extension is None:
+        _, extension = os.path.splitext(file.filename or "")
+    temp_path = os.path.join(UPLOAD_TMP_DIR, uuid.uuid4().hex)
+    saved_file = await save_upload(file, temp_path, max_size)
+    return await store_saved_blob(session, saved_file, extension)
+
+
+async def store_saved_blob(session, saved_file, extension: str, references: int = 1):
+    upload_path = get_blob_path(saved_file.checksum, extension)
+    uploaded = False
+    try:
+        # the upload runs before the lock, no transaction waits on the network
+        if not await storage.exists(upload_path):
+            await storage.put(saved_file.path, upload_path)
+            uploaded = True
+        await lock_blob(session, saved_file.checksum)
+        query = insert(Blob).values(
+            checksum=saved_file.checksum,
+            path=upload_path,
+            size=saved_file.size,
+            refcount=references,
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[Blob.checksum],
+            set_={"refcount": Blob.refcount + references},
+        ).returning(Blob.path)
+        blob__data = await session.execute(query)
+        path = blob__data.scalar_one()
+        if uploaded and path != upload_path:
+            # the content is already stored under another extension
+            await storage.delete(upload_path)
+        elif not await storage.exists(path):
+            # collected between the upload and the lock
+            if not os.path.exists(saved_file.path):
+                raise RuntimeError("Blob was collected while uploading, try again")
+            await storage.put(saved_file.path, path)
+    finally:
+        if os.path.exists(saved_file.path):
+            os.remove(saved_file.path)
+    return path
+
+
+async def add_blob_references(session, path: str, references: int):
+    if references:
+        await session.execute(
+            update(Blob)
+            .where(Blob.path == path)
+            .values(refcount=Blob.refcount + references)
+        )
+
+
+async def release_blob(session, path: str):
+    if not path:
+        return
+    query = (
+        update(Blob)
+        .where(Blob.path == path)
+        .values(refcount=Blob.refcount - 1)
+    )
+    await session.execute(query)
+
+
+async def collect_blobs(session, paths):
+    removed = 0
+    for path in paths:
+        if not path:
+            continue
+        await lock_blob(session, get_blob_checksum(path))
+        blob__data = await session.execute(
+            delete(Blob)
+            .where((Blob.path == path) & (Blob.refcount <= 0))
+            .returning(Blob.path)
+        )
+        if blob__data.scalar_one_or_none() is not None or is_legacy_path(path):
+            await storage.delete(path)
+            removed += 1
+        await session.commit()
+    return removed
+
+
+async def collect_all_blobs(session):
+    blob__data = await session.execute(select(Blob.path).where(Blob.refcount <= 0))
+    removed = await collect_blobs(session, blob__data.scalars().all())
+
+    # files left behind by requests that failed before committing their row
+    known__data = await session.execute(select(Blob.path))
+    known = set(known__data.scalars().all())
+    stale_before = datetime.utcnow() - timedelta(hours=1)
+    async for path in storage.iter_keys(BLOBS_DIR):
+        if path in known:
+            continue
+        # an upload may have placed its file without committing yet
+        if await storage.get_modified_at(path) < stale_before:
+            await storage.delete(path)
+            removed += 1
+    return removed
+
+
+async def main():
+    async with async_session_maker() as session:
+        session.info["statement_timeout"] = 0
+        removed = await collect_all_blobs(session)
+        print(f"{removed} unreferenced blobs removed")
+    await storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] != "gc":
+        print("Usage: python -m files.blobs gc")
+        sys.exit(2)
+    sys.exit(asyncio.run(main()))
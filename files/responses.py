@@ -0,0 +1,141 @@
+import os
+from datetime import timezone
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import quote
+
+import aiofiles
+import starlette.status as status
+from fastapi import Request
+from fastapi.exceptions import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+from settings import FILE_CHUNK_SIZE
+
+
+def get_content_disposition(filename: str):
+    ascii_name = filename.encode("ascii", "ignore").decode().replace('"', "")
+    if ascii_name == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename=\"{ascii_name}\"; filename*=utf-8''{quote(filename)}"
+
+
+def parse_range(range_header: str, size: int):
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    start, _, end = ranges.strip().partition("-")
+    try:
+        if start:
+            start = int(start)
+            end = int(end) if end else size - 1
+        else:
+            # suffix range, the last N bytes
+            length = int(end)
+            start = max(size - length, 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
+def get_etag(checksum: str):
+    return f'"{checksum}"'
+
+
+def get_cache_headers(etag: str = None, last_modified=None, cache_control=None):
+    headers = {}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(
+            last_modified.replace(tzinfo=timezone.utc).timestamp(), usegmt=True
+        )
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+
+def etag_matches(header: str, etag: str):
+    if header.strip() == "*":
+        return True
+    # weak comparison, W/"x" and "x" name the same representation
+    candidates = [item.strip().removeprefix("W/") for item in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def is_not_modified(request: Request, etag: str = None, last_modified=None):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        return modified <= since
+    return False
+
+
+def not_modified_response(headers: dict):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def range_applies(request: Request, headers: dict):
+    # a Range sent with a stale If-Range validator gets the whole file
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    etag = headers.get("ETag")
+    if if_range.strip().startswith(('"', "W/")):
+        return etag is not None and not etag.startswith("W/") and if_range == etag
+    return if_range.strip() == headers.get("Last-Modified")
+
+
+async def iter_file(path: str, start: int, length: int):
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        while length > 0:
+            chunk = await f.read(min(FILE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def range_file_response(
+    request: Request, path: str, filename: str, media_type: str, headers=None
+):
+    size = os.path.getsize(path)
+    headers = {
+        **(headers or {}),
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": get_content_disposition(filename),
+    }
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and range_applies(request, headers):
+        byte_range = parse_range(range_header, size)
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            iter_file(path, 0, size), media_type=media_type, headers=headers
+        )
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file(path, start, end - start + 1),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import shutil
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from urllib.parse import quote, urlsplit
+
+import aiofiles
+import aiohttp
+import starlette.status as status
+from fastapi import Request
+from fastapi.exceptions import HTTPException
+from fastapi.responses import RedirectResponse, Response
+from yarl import URL
+
+from settings import (
+    FILE_CHUNK_SIZE,
+    STORAGE_BACKEND,
+    STORAGE_ACCEL_REDIRECT_PREFIX,
+    S3_ENDPOINT_URL,
+    S3_BUCKET,
+    S3_REGION,
+    S3_ACCESS_KEY,
+    S3_SECRET_KEY,
+    S3_PRESIGN_EXPIRES,
+)
+from .responses import range_file_response, get_content_disposition
+
+
+class LocalStorage:
+    def __init__(self, accel_redirect_prefix: str = ""):
+        self.accel_redirect_prefix = accel_redirect_prefix
+
+    async def put(self, source_path: str, key: str):
+        os.makedirs(os.path.dirname(key) or ".", exist_ok=True)
+        try:
+            os.replace(source_path, key)
+        except OSError:
+            # the upload temp dir may sit on another filesystem
+            await asyncio.to_thread(shutil.move, source_path, key)
+
+    async def fetch(self, key: str, path: str):
+        await asyncio.to_thread(shutil.copyfile, key, path)
+
+    async def exists(self, key: str):
+        return os.path.exists(key)
+
+    async def delete(self, key: str):
+        if os.path.exists(key):
+            os.remove(key)
+
+    async def iter_keys(self, prefix: str):
+        for root, _, filenames in os.walk(prefix):
+            for filename in filenames:
+                yield os.path.join(root, filename)
+
+    async def get_modified_at(self, key: str):
+        return datetime.utcfromtimestamp(os.path.getmtime(key))
+
+    async def download_response(
+        self,
+        request: Request,
+        key: str,
+        filename: str,
+        media_type: str = None,
+        headers: dict = None,
+    ):
+        if not os.path.exists(key):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="File not found"
+            )
+        if self.accel_redirect_prefix:
+            # nginx serves the bytes from an internal location
+            return Response(
+                media_type=media_type,
+                headers={
+                    **(headers or {}),
+                    "X-Accel-Redirect": f"{self.accel_redirect_prefix}{quote(key)}",
+                    "Content-Disposition": get_content_disposition(filename),
+                },
+            )
+        return range_file_response(request, key, filename, media_type, headers)
+
+    async def close(self):
+        pass
+
+
+class S3Storage:
+    def __init__(self, endpoint_url, bucket, region, access_key, secret_key, expires):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.host = urlsplit(self.endpoint_url).netloc
+        self.bucket = bucket
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.expires = expires
+        self.session = None
+
+    def get_session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    def get_path(self, key: str):
+        return f"/{self.bucket}/{key}" if key else f"/{self.bucket}"
+
+    def sign(self, key: bytes, message: str):
+        return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+    def presign(self, method: str, key: str = "", params: dict = None, expires=None):
+        # AWS signature v4 in the query string, path-style addressing
+        now = datetime.utcnow()
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = now.strftime("%Y%m%d")
+        scope = f"{date_stamp}/{self.region}/s3/aws4_request"
+        query = dict(params or {})
+        query.update(
+            {
+                "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+                "X-Amz-Credential": f"{self.access_key}/{scope}",
+                "X-Amz-Date": amz_date,
+                "X-Amz-Expires": str(expires or self.expires),
+                "X-Amz-SignedHeaders": "host",
+            }
+        )
+        canonical_query = "&".join(
+            f"{quote(name, safe='-_.~')}={quote(str(value), safe='-_.~')}"
+            for name, value in sorted(query.items())
+        )
+        canonical_uri = quote(self.get_path(key), safe="/-_.~")
+        canonical_request = "\n".join(
+            [
+                method,
+                canonical_uri,
+                canonical_query,
+                f"host:{self.host}",
+                "",
+                "host",
+                "UNSIGNED-PAYLOAD",
+            ]
+        )
+        string_to_sign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256",
+                amz_date,
+                scope,
+                hashlib.sha256(canonical_request.encode()).hexdigest(),
+            ]
+        )
+        signing_key = self.sign(f"AWS4{self.secret_key}".encode(), date_stamp)
+        for part in (self.region, "s3", "aws4_request"):
+            signing_key = self.sign(signing_key, part)
+        signature = hmac.new(
+            signing_key, string_to_sign.encode(), hashlib.sha256
+        ).hexdigest()
+        return (
+            f"{self.endpoint_url}{canonical_uri}"
+            f"?{canonical_query}&X-Amz-Signature={signature}"
+        )
+
+    async def request(self, method: str, key: str = "", params=None, **kwargs):
+        url = URL(self.presign(method, key, params), encoded=True)
+        return await self.get_session().request(method, url, **kwargs)
+
+    async def put(self, source_path: str, key: str):
+        size = os.path.getsize(source_path)
+        with open(source_path, "rb") as f:
+            # aiohttp reads file payloads in the default executor
+            response = await self.request(
+                "PUT", key, data=f, headers={"Content-Length": str(size)}
+            )
+        async with response:
+            response.raise_for_status()
+        os.remove(source_path)
+
+    async def fetch(self, key: str, path: str):
+        async with await self.request("GET", key) as response:
+            response.raise_for_status()
+            async with aiofiles.open(path, "wb") as f:
+                async for chunk in response.content.iter_chunked(FILE_CHUNK_SIZE):
+                    await f.write(chunk)
+
+    async def exists(self, key: str):
+        async with await self.request("HEAD", key) as response:
+            if response.status == 404:
+                return False
+            response.raise_for_status()
+            return True
+
+    async def delete(self, key: str):
+        async with await self.request("DELETE", key) as response:
+            if response.status != 404:
+                response.raise_for_status()
+
+    async def iter_keys(self, prefix: str):
+        namespace = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+        params = {"list-type": "2", "prefix": prefix}
+        while True:
+            async with await self.request("GET", params=params) as response:
+                response.raise_for_status()
+                root = ElementTree.fromstring(await response.read())
+            for item in root.iter(f"{namespace}Contents"):
+                yield item.find(f"{namespace}Key").text
+            token = root.find(f"{namespace}NextContinuationToken")
+            if token is None:
+                break
+            params = {**params, "continuation-token": token.text}
+
+    async def get_modified_at(self, key: str):
+        async with await self.request("HEAD", key) as response:
+            response.raise_for_status()
+            modified = response.headers.get("Last-Modified")
+        return datetime.strptime(modified, "%a, %d %b %Y %H:%M:%S GMT")
+
+    async def download_response(
+        self,
+        request: Request,
+        key: str,
+        filename: str,
+        media_type: str = None,
+        headers: dict = None,
+    ):
+        # the client fetches the bytes, ranges included, from the bucket
+        params = {"response-content-disposition": get_content_disposition(filename)}
+        if media_type:
+            params["response-content-type"] = media_type
+        if headers and headers.get("Cache-Control"):
+            params["response-cache-control"] = headers["Cache-Control"]
+        return RedirectResponse(self.presign("GET", key, params), status_code=307)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+def create_storage(backend: str):
+    if backend == "s3":
+        return S3Storage(
+            S3_ENDPOINT_URL,
+            S3_BUCKET,
+            S3_REGION,
+            S3_ACCESS_KEY,
+            S3_SECRET_KEY,
+            S3_PRESIGN_EXPIRES,
+        )
+    return LocalStorage(STORAGE_ACCEL_REDIRECT_PREFIX)
+
+
+storage = create_storage(STORAGE_BACKEND)
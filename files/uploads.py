@@ -0,0 +1,73 @@
+import hashlib
+import os
+
+import aiofiles
+import starlette.status as status
+from fastapi import UploadFile
+from fastapi.exceptions import HTTPException
+
+from settings import FILE_CHUNK_SIZE, UPLOAD_MAX_SIZE
+
+
+class SavedFile:
+    def __init__(self, path: str, size: int, checksum: str):
+        self.path = path
+        self.size = size
+        self.checksum = checksum
+
+
+def file_too_large(max_size: int):
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File is too large, the limit is {max_size} bytes",
+    )
+
+
+async def iter_upload(file: UploadFile):
+    while True:
+        chunk = await file.read(FILE_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def save_stream(chunks, path: str, max_size: int = UPLOAD_MAX_SIZE):
+    # readers only ever see complete files under the final name
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.part"
+    checksum = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise file_too_large(max_size)
+                checksum.update(chunk)
+                await f.write(chunk)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return SavedFile(path, size, checksum.hexdigest())
+
+
+async def save_upload(file: UploadFile, path: str, max_size: int = UPLOAD_MAX_SIZE):
+    # the multipart parser already knows the size of spooled parts
+    if file.size is not None and file.size > max_size:
+        raise file_too_large(max_size)
+    return await save_stream(iter_upload(file), path, max_size)
+
+
+async def hash_file(path: str):
+    checksum = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(path, "rb") as f:
+        while True:
+            chunk = await f.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            checksum.update(chunk)
+    return SavedFile(path, size, checksum.hexdigest())
@@ -5,12 +5,37 @@ from fastapi.templating import Jinja2Templates
 
 from admin.apis import admin_router
 from auth.auth import auth_router
-from chat.chat import chat_router
+from auth.emails import email_templates
+from auth.mail import mail_worker
+from chat.buffer import message_buffer
+from chat.chat import chat_router, manager as chat_hub
+from files.storage import storage
 from mobile.mobile import mobile_router
+from mobile.voice import voice_worker
+from redis_client import redis_store
 
 app = FastAPI(title="MobileProjectBackend", version="1.0.0")
 
 
+@app.on_event("startup")
+async def start_background_workers():
+    email_templates.load_all()
+    mail_worker.start()
+    voice_worker.start()
+    await chat_hub.start()
+    message_buffer.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    await mail_worker.stop()
+    await voice_worker.stop()
+    await chat_hub.stop()
+    await message_buffer.stop()
+    await redis_store.close()
+    await storage.close()
+
+
 app.include_router(auth_router, prefix="/auth")
 app.include_router(chat_router, prefix="/chat")
 app.include_router(admin_router, prefix="/admin")
@@ -0,0 +1,73 @@
+"""canonical room keys
+
+Revision ID: b6e1f4a8c3d2
+Revises: a9d3e7f25c61
+Create Date: 2026-10-18 14:51:43.902176
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e1f4a8c3d2'
+down_revision: Union[str, None] = 'a9d3e7f25c61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# same value as chat.rooms.get_room_key: sha256 of the json dump of the
+# ordered user pair
+CANONICAL_KEY = """
+    encode(sha256(convert_to(
+        '{"sender_id": ' || least(sender_id, receiver_id)
+        || ', "receiver_id": ' || greatest(sender_id, receiver_id) || '}',
+        'UTF8'
+    )), 'hex')
+"""
+
+
+def upgrade() -> None:
+    # a pair could get two rooms when both users opened the chat at once,
+    # move the files to the oldest room and drop the others
+    op.execute(
+        """
+        UPDATE chat_files
+        SET room = keep.key
+        FROM room dup, room keep
+        WHERE chat_files.room = dup.key
+          AND least(dup.sender_id, dup.receiver_id)
+              = least(keep.sender_id, keep.receiver_id)
+          AND greatest(dup.sender_id, dup.receiver_id)
+              = greatest(keep.sender_id, keep.receiver_id)
+          AND keep.id = (
+              SELECT min(r.id) FROM room r
+              WHERE least(r.sender_id, r.receiver_id)
+                    = least(dup.sender_id, dup.receiver_id)
+                AND greatest(r.sender_id, r.receiver_id)
+                    = greatest(dup.sender_id, dup.receiver_id)
+          )
+          AND dup.id <> keep.id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM room a
+        USING room b
+        WHERE least(a.sender_id, a.receiver_id) = least(b.sender_id, b.receiver_id)
+          AND greatest(a.sender_id, a.receiver_id)
+              = greatest(b.sender_id, b.receiver_id)
+          AND a.id > b.id
+        """
+    )
+    # chat_files.room follows through ON UPDATE CASCADE
+    op.execute(
+        f"UPDATE room SET key = {CANONICAL_KEY} WHERE key <> {CANONICAL_KEY}"
+    )
+
+
+def downgrade() -> None:
+    # the old keys depended on who opened the chat first and cannot be
+    # restored, canonical keys stay valid for the previous code as well
+    pass
@@ -0,0 +1,37 @@
+"""add user directory indexes
+
+Revision ID: e3c7b9d1f5a4
+Revises: d8f2a6c4e1b9
+Create Date: 2026-10-18 15:42:09.173624
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3c7b9d1f5a4'
+down_revision: Union[str, None] = 'd8f2a6c4e1b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ('first_name', 'last_name', 'email', 'phone_number')
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_users_degree'), 'users', ['degree'], unique=False)
+    for column_name in SEARCH_COLUMNS:
+        op.create_index(
+            f'ix_users_lower_{column_name}',
+            'users',
+            [sa.text(f'lower({column_name}) text_pattern_ops')],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    for column_name in reversed(SEARCH_COLUMNS):
+        op.drop_index(f'ix_users_lower_{column_name}', table_name='users')
+    op.drop_index(op.f('ix_users_degree'), table_name='users')
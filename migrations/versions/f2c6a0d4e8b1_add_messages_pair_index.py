@@ -0,0 +1,36 @@
+"""add messages pair index
+
+Revision ID: f2c6a0d4e8b1
+Revises: e5a3b8c1d9f4
+Create Date: 2026-10-18 13:48:20.331907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c6a0d4e8b1'
+down_revision: Union[str, None] = 'e5a3b8c1d9f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_messages_pair_sent_at_id',
+        'messages',
+        [
+            sa.text('least(sender_id, receiver_id)'),
+            sa.text('greatest(sender_id, receiver_id)'),
+            'sent_at',
+            'id',
+        ],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_pair_sent_at_id', table_name='messages')
@@ -1,5 +1,4 @@
-import os
-import aiofiles
+from typing import List, Optional
 
 from starlette import status
 
@@ -9,41 +8,46 @@ from fastapi.templating import Jinja2Templates
 from fastapi.exceptions import HTTPException
 from sqlalchemy import select, update, delete, insert
 from fastapi.responses import HTMLResponse
-from models.models import Users, Tasks, Degree
-from auth.utils import verify_token
-from database import get_async_session
+from models.models import Users, Tasks
+from auth.schemas import CurrentUser
+from auth.utils import verify_token, get_current_user
+from database import get_async_session, statement_timeout
 from models.models import UserMessagesToAdminViaTask, SupportForUser
+from files.audio import sniff_upload, AUDIO_EXTENSIONS
+from files.blobs import store_blob, release_blob, collect_blobs
+from settings import (
+    DB_STATEMENT_TIMEOUT_MOBILE,
+    TASK_PAGE_SIZE,
+    TASK_MAX_PAGE_SIZE,
+    VOICE_MAX_SIZE,
+)
+from .utils import (
+    get_degree_counts,
+    get_filtered_tasks_page,
+    get_task_scope,
+    load_tasks,
+    TASK_BUCKETS,
+)
+from .scheme import TaskScheme
+from .stats import move_task_in_stats, get_stats_key
+from .voice import attach_voice
 
 templates = Jinja2Templates(directory="templates")
 
-mobile_router = APIRouter()
+mobile_router = APIRouter(
+    dependencies=[Depends(statement_timeout(DB_STATEMENT_TIMEOUT_MOBILE))]
+)
 
 
 @mobile_router.get(
     "/dashboard-api",
 )
 async def get_data(
+    by_status: bool = False,
+    by_importance: bool = False,
     session: AsyncSession = Depends(get_async_session),
 ):
-    tasks_data = select(Tasks)
-    tasks__data = await session.execute(tasks_data)
-    tasks = tasks__data.scalars().all()
-
-    degree_data = select(Degree)
-    degree__data = await session.execute(degree_data)
-    degrees = degree__data.scalars().all()
-    ctx = {}
-    for i in degrees:
-        ctx.update({i.degree: 0})
-
-    for task in tasks:
-        degree_id = task.degree
-        degree_one = select(Degree).where(Degree.id == degree_id)
-        degree__one = await session.execute(degree_one)
-        degree_one = degree__one.scalars().one()
-        ctx[degree_one.degree] += 1
-
-    return ctx
+    return await get_degree_counts(session, by_status, by_importance)
 
 
 @mobile_router.get("/dashboard", response_class=HTMLResponse)
@@ -51,97 +55,43 @@ async def dashboard(request: Request):
     return templates.TemplateResponse("dashboard.html", {"request": request})
 
 
-@mobile_router.get("/get-tasks")
+@mobile_router.get("/get-tasks", response_model=List[TaskScheme])
 async def get_tasks(
-    token: dict = Depends(verify_token),
+    current_user: CurrentUser = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-
-    user_id = token.get("user_id")
-    user_existing_query = select(Users).where(Users.id == user_id)
-    user__data = await session.execute(user_existing_query)
-    user_data = user__data.scalars().one_or_none()
-    if user_data is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found that given id",
-        )
     try:
-        user_degree_id = user_data.degree
-        get_tasks_by_section = select(Tasks).where(
-            (Tasks.user == user_id)
-            | (Tasks.degree == user_degree_id if user_degree_id is not None else 0)
-        )
-        tasks__data = await session.execute(get_tasks_by_section)
-        tasks = tasks__data.scalars().all()
-
-        users = select(Users)
-        users__data = await session.execute(users)
-        users_dict = {user.id: user for user in users__data.scalars().all()}
-        for task in tasks:
-            user = task.user
-            if user in users_dict:
-                user_data = users_dict[user]
-                user_dict = {
-                    key: getattr(user_data, key)
-                    for key in user_data.__dict__.keys()
-                    if key != "password"
-                }
-                task.user = user_dict
-        return tasks
+        scope = get_task_scope(current_user.id, current_user.degree)
+        return await load_tasks(session, scope)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @mobile_router.get("/get-filtered-tasks")
 async def get_filtered_tasks(
-    token: dict = Depends(verify_token),
+    limit: int = TASK_PAGE_SIZE,
+    offset: int = 0,
+    bucket: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    user_existing_query = select(Users).where(Users.id == user_id)
-    user__ = await session.execute(user_existing_query)
-    user_ = user__.scalars().one_or_none()
-    if user_ is None:
+    if bucket is not None and bucket not in TASK_BUCKETS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"bucket must be one of {', '.join(TASK_BUCKETS)}",
         )
+    statuses = TASK_BUCKETS if bucket is None else {bucket: TASK_BUCKETS[bucket]}
+    limit = max(1, min(limit, TASK_MAX_PAGE_SIZE))
     try:
-        task = select(Tasks)
-        tasks__data = await session.execute(task)
-        tasks = tasks__data.scalars().all()
-        ctx = [{"NotCompleted": [], "InProgress": [], "Completed": []}]
-
-        users = select(Users)
-        users__data = await session.execute(users)
-        users_dict = {user.id: user for user in users__data.scalars().all()}
-        for task in tasks:
-            user = task.user
-            if user in users_dict:
-                user_data = users_dict[user]
-                user_dict = {
-                    key: getattr(user_data, key)
-                    for key in user_data.__dict__.keys()
-                    if key != "password"
-                }
-                task.user = user_dict
-            if task.status == "Yakunlangan":
-                ctx[0]["Completed"].append(task)
-            elif task.status == "Bajarilayotgan":
-                ctx[0]["InProgress"].append(task)
-            elif task.status == "Yakunlanmagan":
-                ctx[0]["NotCompleted"].append(task)
-
-        return ctx
+        ctx = await get_filtered_tasks_page(
+            session,
+            current_user.id,
+            current_user.degree,
+            statuses,
+            limit,
+            max(offset, 0),
+        )
+        return [ctx]
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -149,27 +99,15 @@ async def get_filtered_tasks(
 @mobile_router.patch("/start-the-task")
 async def start_the_task(
     task_id: int,
-    token: dict = Depends(verify_token),
+    current_user: CurrentUser = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    user_existing_query = select(Users).where(Users.id == user_id)
-    user__ = await session.execute(user_existing_query)
-    user_ = user__.scalars().one_or_none()
-    if user_ is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
+    user_id = current_user.id
     task_existing_query = select(Tasks).where(
         (Tasks.id == task_id)
         & (Tasks.user == user_id)
         & (Tasks.status == "Yakunlanmagan")
-    )
+    ).with_for_update()
     task__data = await session.execute(task_existing_query)
     task_data = task__data.scalars().one_or_none()
     if task_data is None:
@@ -178,7 +116,9 @@ async def start_the_task(
             detail="Task not found that given id",
         )
     try:
+        old_stats_key = get_stats_key(task_data)
         task_data.status = "Bajarilayotgan"
+        await move_task_in_stats(session, old_stats_key, get_stats_key(task_data))
 
         user_dict = {
             key: getattr(task_data, key)
@@ -196,28 +136,16 @@ async def start_the_task(
 @mobile_router.patch("/complete-the-task")
 async def complete_the_task(
     task_id: int,
-    token: dict = Depends(verify_token),
+    current_user: CurrentUser = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    user_existing = select(Users).where(Users.id == user_id)
-    user__ = await session.execute(user_existing)
-    user_ = user__.scalars().one()
-    if user_ is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
+    user_id = current_user.id
 
     task_existing_query = select(Tasks).where(
         (Tasks.id == task_id)
         & (Tasks.user == user_id)
         & (Tasks.status == "Bajarilayotgan")
-    )
+    ).with_for_update()
     task__data = await session.execute(task_existing_query)
     task_data = task__data.scalars().one_or_none()
     if task_data is None:
@@ -226,7 +154,9 @@ async def complete_the_task(
             detail="Task or user not found that given id",
         )
     try:
+        old_stats_key = get_stats_key(task_data)
         task_data.status = "Yakunlangan"
+        await move_task_in_stats(session, old_stats_key, get_stats_key(task_data))
         user_dict = {
             key: getattr(task_data, key)
             for key in task_data.__dict__.keys()
@@ -245,18 +175,11 @@ async def send_message_to_admin(
     task_id: int,
     message: str = None,
     voice: UploadFile = None,
-    token: dict = Depends(verify_token),
+    current_user: CurrentUser = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Token not provided"
-        )
-    user_id = token.get("user_id")
-    checking_user = select(Users).where((Users.id == user_id) & (Users.status == False))
-    user__data = await session.execute(checking_user)
-    user = user__data.scalars().one_or_none()
-    if not user:
+    user_id = current_user.id
+    if current_user.status is not False:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found in the base or you have not access to send message to admin",
@@ -283,6 +206,7 @@ async def send_message_to_admin(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Sorry, this error from database, please try again",
             )
+        out_file = None
         if message is not None:
             message_create = insert(UserMessagesToAdminViaTask).values(
                 sender_id=user_id,
@@ -292,26 +216,16 @@ async def send_message_to_admin(
             )
             await session.execute(message_create)
         elif voice is not None:
-            if (
-                not voice.filename.endswith(".wav")
-                or not voice.filename.endswith(".mp3")
-                or not voice.filename.endswith("ogg")
-            ):
+            # the client supplied name says nothing about the bytes
+            voice_type = await sniff_upload(voice)
+            if voice_type is None:
                 raise HTTPException(
                     status_code=status.HTTP_406_NOT_ACCEPTABLE,
                     detail="You can send only format of audio files",
                 )
-            base_filename, file_extension = os.path.splitext(voice.filename)
-            out_file = f"uploads/VoiceMessages/{voice.filename}"
-            index = 1
-            while os.path.exists(out_file):
-                out_file = (
-                    f"uploads/VoiceMessages/{base_filename}_{index}{file_extension}"
-                )
-                index += 1
-            async with aiofiles.open(out_file, "wb") as f:
-                content = await voice.read()
-                await f.write(content)
+            out_file = await store_blob(
+                session, voice, VOICE_MAX_SIZE, AUDIO_EXTENSIONS[voice_type]
+            )
             voice_create = insert(UserMessagesToAdminViaTask).values(
                 sender_id=user_id,
                 voice=str(out_file),
@@ -319,7 +233,10 @@ async def send_message_to_admin(
                 receiver_id=admin_data.id,
             )
             await session.execute(voice_create)
+            await attach_voice(session, out_file)
         await session.commit()
+        # a recording sent before is swapped for its opus copy right away
+        await collect_blobs(session, [out_file])
         inserted_message = (
             select(UserMessagesToAdminViaTask)
             .where(UserMessagesToAdminViaTask.sender_id == user_id)
@@ -357,6 +274,8 @@ async def send_message_to_admin(
 
         return inserted_message_result
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -432,10 +351,7 @@ async def delete_message(
             status_code=status.HTTP_404_NOT_FOUND,
         )
     try:
-        if message_data.voice is not None:
-            out_file = message_data.voice
-            if os.path.exists(out_file):
-                os.remove(out_file)
+        await release_blob(session, message_data.voice)
         deleting_message = delete(UserMessagesToAdminViaTask).where(
             (UserMessagesToAdminViaTask.id == message_id)
             & (UserMessagesToAdminViaTask.task_id == task_id)
@@ -443,6 +359,7 @@ async def delete_message(
         )
         await session.execute(deleting_message)
         await session.commit()
+        await collect_blobs(session, [message_data.voice])
         return {
             "success": True,
             "detail": "Message has been deleted successfully",
@@ -456,26 +373,15 @@ async def delete_message(
 async def support_admin(
     message: str = None,
     voice: UploadFile = None,
-    token: dict = Depends(verify_token),
+    current_user: CurrentUser = Depends(get_current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    if token is None:
-        raise HTTPException(
-            detail="Token not provided", status_code=status.HTTP_403_FORBIDDEN
-        )
     if message and voice:
         raise HTTPException(
             detail="You cannot send both at the same time",
             status_code=status.HTTP_406_NOT_ACCEPTABLE,
         )
-    user_id = token.get("user_id")
-    checking_user = select(Users).where(Users.id == user_id)
-    user__data = await session.execute(checking_user)
-    user_data = user__data.scalars().one_or_none()
-    if not user_data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
+    user_id = current_user.id
     get_admin_id = select(Users).where(Users.status == True)
     admin__data = await session.execute(get_admin_id)
     admin_data = admin__data.scalars().one_or_none()
@@ -485,35 +391,30 @@ async def support_admin(
             detail="Sorry, this error from database. Try again later",
         )
     try:
+        out_file = None
         if message is not None:
             inserting_query = insert(SupportForUser).values(
                 message=message, sender_id=user_id, receiver_id=admin_data.id
             )
             await session.execute(inserting_query)
         elif voice is not None:
-            if (
-                not voice.filename.endswith(".ogg")
-                or not voice.filename.endswith(".wav")
-                or not voice.filename.endswith(".mp3")
-            ):
+            voice_type = await sniff_upload(voice)
+            if voice_type is None:
                 raise HTTPException(
                     detail="You can send voice that given formats",
                     status_code=status.HTTP_406_NOT_ACCEPTABLE,
                 )
-            base_filename, file_extension = os.path.splitext(voice.filename)
-            out_file = f"uploads/SupportVoiceMessages/{voice.filename}"
-            index = 1
-            while os.path.exists(out_file):
-                out_file = f"uploads/SupportVoiceMessages/{base_filename}_{index}{file_extension}"
-                index += 1
-            async with aiofiles.open(out_file, "wb") as f:
-                content = await voice.read()
-                await f.write(content)
+            out_file = await store_blob(
+                session, voice, VOICE_MAX_SIZE, AUDIO_EXTENSIONS[voice_type]
+            )
             voice_create = insert(SupportForUser).values(
                 voice=str(out_file), sender_id=user_id, receiver_id=admin_data.id
             )
             await session.execute(voice_create)
+            await attach_voice(session, out_file)
         await session.commit()
+        # a recording sent before is swapped for its opus copy right away
+        await collect_blobs(session, [out_file])
         inserted_message = (
             select(SupportForUser)
             .where(SupportForUser.sender_id == user_id)
@@ -549,6 +450,8 @@ async def support_admin(
         inserted_message_result.task_id = task.__dict__
 
         return inserted_message_result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             detail=str(e), status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
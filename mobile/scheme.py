@@ -0,0 +1,57 @@
+from datetime import date, datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class AssigneeScheme(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    phone_number: Optional[str] = None
+    email: Optional[str] = None
+    user_photo: Optional[str] = None
+    degree: Optional[int] = None
+    status: Optional[bool] = None
+    date_joined: Optional[datetime] = None
+
+
+class TaskDegreeScheme(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    degree: str
+
+
+class AdditionScheme(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    task_id: Optional[int] = None
+    file: Optional[str] = None
+    added_at: Optional[datetime] = None
+
+
+class TaskScheme(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str
+    description: Optional[str] = None
+    degree: Optional[int] = None
+    degree_info: Optional[TaskDegreeScheme] = Field(
+        default=None, validation_alias="task_degree"
+    )
+    # the assignee keeps the "user" key the clients already read
+    user: Optional[AssigneeScheme] = Field(default=None, validation_alias="assignee")
+    created_at: Optional[date] = None
+    deadline: Optional[date] = None
+    importance: Optional[str] = None
+    status: Optional[str] = None
+    created_in_timestamp: Optional[datetime] = None
+
+
+class TaskDetailScheme(TaskScheme):
+    additions: List[AdditionScheme] = []
@@ -0,0 +1,136 @@
+import asyncio
+import sys
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+
+from database import async_session_maker
+from models.models import Tasks, TaskStats
+
+
+def get_deadline_bucket(deadline):
+    if deadline is None:
+        return ""
+    return deadline.strftime("%Y-%m")
+
+
+def get_stats_key(task):
+    return (
+        task.degree,
+        task.status or "",
+        task.importance or "",
+        get_deadline_bucket(task.deadline),
+    )
+
+
+async def change_task_stats(session, key, delta):
+    degree, task_status, importance, deadline_bucket = key
+    if degree is None or delta == 0:
+        return
+    query = insert(TaskStats).values(
+        degree=degree,
+        status=task_status,
+        importance=importance,
+        deadline_bucket=deadline_bucket,
+        count=delta,
+    )
+    query = query.on_conflict_do_update(
+        constraint="uq_task_stats",
+        set_={"count": TaskStats.count + query.excluded.count},
+    )
+    await session.execute(query)
+
+
+async def add_task_to_stats(session, task):
+    await change_task_stats(session, get_stats_key(task), 1)
+
+
+async def remove_task_from_stats(session, task):
+    await change_task_stats(session, get_stats_key(task), -1)
+
+
+async def move_task_in_stats(session, old_key, new_key):
+    if old_key == new_key:
+        return
+    await change_task_stats(session, old_key, -1)
+    await change_task_stats(session, new_key, 1)
+
+
+def get_expected_stats_query():
+    deadline_bucket = func.coalesce(func.to_char(Tasks.deadline, "YYYY-MM"), "")
+    task_status = func.coalesce(Tasks.status, "")
+    importance = func.coalesce(Tasks.importance, "")
+    return (
+        select(
+            Tasks.degree,
+            task_status,
+            importance,
+            deadline_bucket,
+            func.count(Tasks.id),
+        )
+        .where(Tasks.degree.is_not(None))
+        .group_by(Tasks.degree, task_status, importance, deadline_bucket)
+    )
+
+
+async def rebuild_task_stats(session):
+    await session.execute(delete(TaskStats))
+    await session.execute(
+        insert(TaskStats).from_select(
+            ["degree", "status", "importance", "deadline_bucket", "count"],
+            get_expected_stats_query(),
+        )
+    )
+    await session.commit()
+
+
+async def check_task_stats(session):
+    expected__data = await session.execute(get_expected_stats_query())
+    expected = {tuple(row[:4]): row[4] for row in expected__data.all()}
+
+    stats__data = await session.execute(
+        select(
+            TaskStats.degree,
+            TaskStats.status,
+            TaskStats.importance,
+            TaskStats.deadline_bucket,
+            TaskStats.count,
+        ).where(TaskStats.count != 0)
+    )
+    actual = {tuple(row[:4]): row[4] for row in stats__data.all()}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        if expected.get(key, 0) != actual.get(key, 0):
+            mismatches.append(
+                {
+                    "degree": key[0],
+                    "status": key[1],
+                    "importance": key[2],
+                    "deadline_bucket": key[3],
+                    "expected": expected.get(key, 0),
+                    "actual": actual.get(key, 0),
+                }
+            )
+    return mismatches
+
+
+async def main(command):
+    async with async_session_maker() as session:
+        session.info["statement_timeout"] = 0
+        if command == "rebuild":
+            await rebuild_task_stats(session)
+            print("task_stats rebuilt")
+            return 0
+        mismatches = await check_task_stats(session)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} mismatched task_stats rows")
+        return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("rebuild", "check"):
+        print("Usage: python -m mobile.stats [rebuild|check]")
+        sys.exit(2)
+    sys.exit(asyncio.run(main(sys.argv[1])))
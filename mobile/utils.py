@@ -0,0 +1,125 @@
+from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload, selectinload
+
+from models.models import Degree, TaskStats, TaskStatus, Tasks
+from .scheme import TaskScheme, TaskDetailScheme
+
+
+async def get_degree_counts(session, by_status=False, by_importance=False):
+    columns = [Degree.degree]
+    if by_status:
+        columns.append(TaskStats.status)
+    if by_importance:
+        columns.append(TaskStats.importance)
+    query = (
+        select(*columns, func.coalesce(func.sum(TaskStats.count), 0))
+        .select_from(Degree)
+        .outerjoin(TaskStats, TaskStats.degree == Degree.id)
+        .group_by(Degree.id, *columns)
+    )
+    counts__data = await session.execute(query)
+
+    ctx = {}
+    status_ctx = {}
+    importance_ctx = {}
+    for row in counts__data.all():
+        degree_name = row[0]
+        count = int(row[-1])
+        ctx[degree_name] = ctx.get(degree_name, 0) + count
+        if count == 0:
+            continue
+        index = 1
+        if by_status:
+            statuses = status_ctx.setdefault(degree_name, {})
+            statuses[row[index]] = statuses.get(row[index], 0) + count
+            index += 1
+        if by_importance:
+            importances = importance_ctx.setdefault(degree_name, {})
+            importances[row[index]] = importances.get(row[index], 0) + count
+
+    if not by_status and not by_importance:
+        return ctx
+    data = {"degrees": ctx}
+    if by_status:
+        data["status"] = {name: status_ctx.get(name, {}) for name in ctx}
+    if by_importance:
+        data["importance"] = {name: importance_ctx.get(name, {}) for name in ctx}
+    return data
+
+
+TASK_BUCKETS = {
+    "NotCompleted": TaskStatus.not_completed.value,
+    "InProgress": TaskStatus.in_progress.value,
+    "Completed": TaskStatus.completed.value,
+}
+
+
+def get_tasks_query(with_additions=False):
+    options = [joinedload(Tasks.assignee), joinedload(Tasks.task_degree)]
+    if with_additions:
+        options.append(selectinload(Tasks.additions))
+    return select(Tasks).options(*options)
+
+
+async def load_tasks(session, *criteria, with_additions=False):
+    query = get_tasks_query(with_additions).where(*criteria).order_by(Tasks.id)
+    tasks__data = await session.execute(query)
+    scheme = TaskDetailScheme if with_additions else TaskScheme
+    return [scheme.model_validate(task) for task in tasks__data.scalars().all()]
+
+
+async def load_task(session, task_id: int):
+    query = (
+        get_tasks_query(with_additions=True)
+        .where(Tasks.id == task_id)
+        .execution_options(populate_existing=True)
+    )
+    task__data = await session.execute(query)
+    return TaskDetailScheme.model_validate(task__data.scalars().one())
+
+
+def get_task_scope(user_id: int, degree_id):
+    if degree_id is None:
+        return Tasks.user == user_id
+    return (Tasks.user == user_id) | (Tasks.degree == degree_id)
+
+
+async def get_filtered_tasks_page(
+    session, user_id: int, degree_id, statuses: dict, limit: int, offset: int
+):
+    scope = get_task_scope(user_id, degree_id)
+    counts__data = await session.execute(
+        select(Tasks.status, func.count(Tasks.id))
+        .where(scope & Tasks.status.in_(statuses.values()))
+        .group_by(Tasks.status)
+    )
+    status_counts = dict(counts__data.all())
+
+    # one query for every bucket: number rows per status and keep the page
+    position = (
+        func.row_number()
+        .over(partition_by=Tasks.status, order_by=Tasks.id.desc())
+        .label("position")
+    )
+    ranked = (
+        select(Tasks.id, position)
+        .where(scope & Tasks.status.in_(statuses.values()))
+        .subquery()
+    )
+    query = (
+        get_tasks_query()
+        .join(ranked, ranked.c.id == Tasks.id)
+        .where(ranked.c.position > offset, ranked.c.position <= offset + limit)
+        .order_by(Tasks.id.desc())
+    )
+    tasks__data = await session.execute(query)
+
+    buckets = {task_status: name for name, task_status in statuses.items()}
+    ctx = {name: [] for name in statuses}
+    for task in tasks__data.scalars().all():
+        ctx[buckets[task.status]].append(TaskScheme.model_validate(task))
+    ctx["counts"] = {
+        name: status_counts.get(task_status, 0)
+        for name, task_status in statuses.items()
+    }
+    return ctx
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from database import async_session_maker
+from files.audio import transcode_voice
+from files.blobs import (
+    add_blob_references,
+    collect_blobs,
+    get_blob_checksum,
+    lock_blob,
+    store_saved_blob,
+)
+from files.storage import storage
+from files.uploads import hash_file
+from models.models import (
+    Blob,
+    SupportForUser,
+    UserMessagesToAdminViaTask,
+    VoiceStatus,
+    VoiceTranscode,
+)
+from settings import (
+    UPLOAD_TMP_DIR,
+    VOICE_TRANSCODE_BATCH_SIZE,
+    VOICE_TRANSCODE_POLL_INTERVAL,
+    VOICE_TRANSCODE_MAX_ATTEMPTS,
+    VOICE_TRANSCODE_RETRY_BACKOFF,
+    VOICE_TRANSCODE_LEASE,
+)
+
+VOICE_TABLES = (UserMessagesToAdminViaTask, SupportForUser)
+
+
+async def apply_voice_assets(session, transcode):
+    # rows drop the original for the opus copy, which frees the original blob
+    count = 0
+    for table in VOICE_TABLES:
+        rows__data = await session.execute(
+            update(table)
+            .where(table.voice == transcode.source)
+            .values(
+                voice=transcode.opus_path,
+                voice_duration=transcode.duration,
+                voice_waveform=transcode.waveform,
+            )
+            .returning(table.id)
+        )
+        count += len(rows__data.all())
+    if count and transcode.opus_path != transcode.source:
+        await add_blob_references(session, transcode.opus_path, count)
+        await add_blob_references(session, transcode.source, -count)
+    return count
+
+
+async def attach_voice(session, source: str):
+    # the worker takes the same lock before swapping the rows of a source
+    await lock_blob(session, get_blob_checksum(source))
+    transcode__data = await session.execute(
+        select(VoiceTranscode).where(VoiceTranscode.source == source)
+    )
+    transcode = transcode__data.scalars().one_or_none()
+    if transcode is None:
+        await session.execute(
+            insert(VoiceTranscode)
+            .values(source=source, status=VoiceStatus.pending.value)
+            .on_conflict_do_nothing(index_elements=[VoiceTranscode.source])
+        )
+        return
+    if transcode.status != VoiceStatus.ready.value:
+        return
+    # the same recording was sent before, reuse its opus copy if still stored
+    blob__data = await session.execute(
+        select(Blob.id).where(Blob.path == transcode.opus_path).with_for_update()
+    )
+    if blob__data.scalar_one_or_none() is None:
+        transcode.status = VoiceStatus.pending.value
+        transcode.attempts = 0
+        transcode.next_attempt_at = datetime.utcnow()
+        transcode.opus_path = None
+        return
+    await apply_voice_assets(session, transcode)
+
+
+class VoiceTranscodeWorker:
+    def __init__(self, batch_size, poll_interval, max_attempts, backoff, lease):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def run(self):
+        while True:
+            try:
+                processed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Voice transcode worker error: {e}")
+                processed = 0
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def claim(self):
+        # jobs left in processing by a crashed worker come back once the lease ends
+        async with async_session_maker() as session:
+            now = datetime.utcnow()
+            query = (
+                select(VoiceTranscode)
+                .where(
+                    VoiceTranscode.status.in_(
+                        [VoiceStatus.pending.value, VoiceStatus.processing.value]
+                    )
+                    & (VoiceTranscode.next_attempt_at <= now)
+                )
+                .order_by(VoiceTranscode.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            transcodes__data = await session.execute(query)
+            transcodes = transcodes__data.scalars().all()
+            for transcode in transcodes:
+                transcode.status = VoiceStatus.processing.value
+                transcode.next_attempt_at = now + timedelta(seconds=self.lease)
+            await session.commit()
+            return [(transcode.id, transcode.source) for transcode in transcodes]
+
+    async def transcode(self, source: str, work_dir: str):
+        source_path = os.path.join(work_dir, "source")
+        output_path = os.path.join(work_dir, "voice.ogg")
+        await storage.fetch(source, source_path)
+        duration, waveform = await transcode_voice(source_path, output_path)
+        return await hash_file(output_path), duration, waveform
+
+    async def complete(self, transcode_id: int, saved_file, duration, waveform):
+        async with async_session_maker() as session:
+            transcode = await session.get(VoiceTranscode, transcode_id)
+            await lock_blob(session, get_blob_checksum(transcode.source))
+            # rows add their references once they point at the blob
+            transcode.opus_path = await store_saved_blob(
+                session, saved_file, ".ogg", references=0
+            )
+            transcode.attempts += 1
+            transcode.status = VoiceStatus.ready.value
+            transcode.duration = duration
+            transcode.waveform = json.dumps(waveform)
+            transcode.last_error = None
+            transcode.finished_at = datetime.utcnow()
+            await apply_voice_assets(session, transcode)
+            await session.commit()
+            await collect_blobs(session, [transcode.source, transcode.opus_path])
+
+    async def fail(self, transcode_id: int, error: Exception):
+        async with async_session_maker() as session:
+            transcode = await session.get(VoiceTranscode, transcode_id)
+            transcode.attempts += 1
+            transcode.last_error = str(error)
+            if transcode.attempts >= self.max_attempts:
+                transcode.status = VoiceStatus.failed.value
+            else:
+                delay = self.backoff * 2 ** (transcode.attempts - 1)
+                transcode.status = VoiceStatus.pending.value
+                transcode.next_attempt_at = datetime.utcnow() + timedelta(
+                    seconds=delay
+                )
+            await session.commit()
+
+    async def drain_once(self):
+        # ffmpeg runs outside any transaction, each job is committed on its own
+        transcodes = await self.claim()
+        for transcode_id, source in transcodes:
+            work_dir = os.path.join(UPLOAD_TMP_DIR, uuid.uuid4().hex)
+            os.makedirs(work_dir)
+            try:
+                saved_file, duration, waveform = await self.transcode(source, work_dir)
+                await self.complete(transcode_id, saved_file, duration, waveform)
+            except Exception as e:
+                await self.fail(transcode_id, e)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        return len(transcodes)
+
+
+voice_worker = VoiceTranscodeWorker(
+    VOICE_TRANSCODE_BATCH_SIZE,
+    VOICE_TRANSCODE_POLL_INTERVAL,
+    VOICE_TRANSCODE_MAX_ATTEMPTS,
+    VOICE_TRANSCODE_RETRY_BACKOFF,
+    VOICE_TRANSCODE_LEASE,
+)
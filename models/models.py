@@ -9,8 +9,12 @@ from sqlalchemy import (
     Boolean,
     ForeignKey,
     Text,
+    Float,
     Date,
+    UniqueConstraint,
+    Index,
 )
+from sqlalchemy import func
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -33,24 +37,37 @@ class Users(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     first_name = Column(String)
     last_name = Column(String)
-    phone_number = Column(String)
-    email = Column(String)
+    phone_number = Column(String, unique=True, index=True)
+    email = Column(String, unique=True, index=True)
     user_photo = Column(String, nullable=True)
-    degree = Column(Integer, ForeignKey("degree.id"))
+    degree = Column(Integer, ForeignKey("degree.id"), index=True)
     password = Column(String)
-    status = Column(Boolean, default=False)
+    status = Column(Boolean, default=False, index=True)
     date_joined = Column(TIMESTAMP, default=datetime.utcnow)
 
 
+# prefix search in the user directory filters on lower(column) LIKE 'q%'
+for column_name in ("first_name", "last_name", "email", "phone_number"):
+    Index(
+        f"ix_users_lower_{column_name}",
+        func.lower(getattr(Users, column_name)).label(f"lower_{column_name}"),
+        postgresql_ops={f"lower_{column_name}": "text_pattern_ops"},
+    )
+
+
 class Room(Base):
     __tablename__ = "room"
     metadata = metadata
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    key = Column(String)
+    key = Column(String, unique=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"))
-    receiver_id = Column(Integer, ForeignKey("users.id"))
+    receiver_id = Column(Integer, ForeignKey("users.id"), index=True)
     created_at = Column(TIMESTAMP, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_room_sender_id_receiver_id", "sender_id", "receiver_id"),
+    )
+
 
 class Message(Base):
     __tablename__ = "messages"
@@ -61,6 +78,51 @@ class Message(Base):
     message = Column(String)
     sent_at = Column(TIMESTAMP, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_messages_sender_id_receiver_id", "sender_id", "receiver_id"),
+        Index("ix_messages_receiver_id", "receiver_id"),
+    )
+
+
+Index(
+    "ix_messages_pair_sent_at_id",
+    func.least(Message.sender_id, Message.receiver_id),
+    func.greatest(Message.sender_id, Message.receiver_id),
+    Message.sent_at,
+    Message.id,
+)
+
+
+class MessageRead(Base):
+    __tablename__ = "message_reads"
+    metadata = metadata
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    peer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    last_read_message_id = Column(Integer, nullable=False, default=0)
+    read_at = Column(TIMESTAMP, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "peer_id", name="uq_message_reads"),
+    )
+
+
+class ChatFile(Base):
+    __tablename__ = "chat_files"
+    metadata = metadata
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    room = Column(
+        String,
+        ForeignKey("room.key", onupdate="CASCADE", ondelete="CASCADE"),
+        index=True,
+    )
+    sender_id = Column(Integer, ForeignKey("users.id"))
+    filename = Column(String, nullable=False)
+    mime = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    path = Column(String, nullable=False)
+    sent_at = Column(TIMESTAMP, default=datetime.utcnow)
+
 
 # class Group(Base):
 #     __tablename__ = "group"
@@ -88,6 +150,7 @@ class TaskImportance(enum.Enum):
 
 class TaskStatus(enum.Enum):
     completed = "Yakunlangan"
+    in_progress = "Bajarilayotgan"
     not_completed = "Yakunlanmagan"
 
 
@@ -97,23 +160,59 @@ class Tasks(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     title = Column(String, nullable=False)
     description = Column(Text)
-    degree = Column(Integer, ForeignKey("degree.id"))
-    user = Column(Integer, ForeignKey("users.id"))
+    degree = Column(Integer, ForeignKey("degree.id"), index=True)
+    user = Column(Integer, ForeignKey("users.id"), index=True)
     created_at = Column(Date, default=date.today())
     deadline = Column(Date)
     importance = Column(String)
-    status = Column(String, default=TaskStatus.not_completed.value)
+    status = Column(String, default=TaskStatus.not_completed.value, index=True)
     created_in_timestamp = Column(TIMESTAMP, default=datetime.utcnow)
 
+    # lazy="raise" keeps async handlers from loading these implicitly,
+    # use the loaders in mobile.utils instead
+    assignee = relationship("Users", foreign_keys=[user], lazy="raise")
+    task_degree = relationship("Degree", foreign_keys=[degree], lazy="raise")
+    additions = relationship(
+        "AdditionForTasks",
+        back_populates="task",
+        order_by="AdditionForTasks.id",
+        lazy="raise",
+    )
+
+    __table_args__ = (
+        Index("ix_tasks_user_status_id", "user", "status", "id"),
+        Index("ix_tasks_degree_status_id", "degree", "status", "id"),
+    )
+
 
 class AdditionForTasks(Base):
     __tablename__ = "additions"
     metadata = metadata
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     task_id = Column(Integer, ForeignKey("tasks.id"))
-    file = Column(String)
+    file = Column(String, index=True)
+    filename = Column(String, nullable=True)
     added_at = Column(TIMESTAMP, default=datetime.utcnow)
 
+    task = relationship("Tasks", back_populates="additions", lazy="raise")
+
+
+class TaskStats(Base):
+    __tablename__ = "task_stats"
+    metadata = metadata
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    degree = Column(Integer, ForeignKey("degree.id", ondelete="CASCADE"))
+    status = Column(String, nullable=False, default="")
+    importance = Column(String, nullable=False, default="")
+    deadline_bucket = Column(String, nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "degree", "status", "importance", "deadline_bucket", name="uq_task_stats"
+        ),
+    )
+
 
 # class QuestionsForTasks(Base):
 #     __tablename__ = "questions"
@@ -139,11 +238,22 @@ class UserMessagesToAdminViaTask(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     message = Column(String, nullable=True)
     voice = Column(String, nullable=True)
+    # set by the voice worker when it swaps voice for the opus copy
+    voice_duration = Column(Float, nullable=True)
+    voice_waveform = Column(Text, nullable=True)
     sender_id = Column(Integer, ForeignKey("users.id"))
     task_id = Column(Integer, ForeignKey("tasks.id"))
     receiver_id = Column(Integer, ForeignKey("users.id"))
     sent_at = Column(TIMESTAMP, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index(
+            "ix_user_messages_to_admin_via_task_task_id_sender_id",
+            "task_id",
+            "sender_id",
+        ),
+    )
+
 
 class SupportForUser(Base):
     __tablename__ = "support_for_user"
@@ -151,6 +261,75 @@ class SupportForUser(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     message = Column(String, nullable=False)
     voice = Column(String, nullable=False)
+    # set by the voice worker when it swaps voice for the opus copy
+    voice_duration = Column(Float, nullable=True)
+    voice_waveform = Column(Text, nullable=True)
     sender_id = Column(Integer, ForeignKey("users.id"))
     receiver_id = Column(Integer, ForeignKey("users.id"))
     sent_at = Column(TIMESTAMP, default=datetime.utcnow)
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+    metadata = metadata
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    checksum = Column(String, nullable=False, unique=True, index=True)
+    path = Column(String, nullable=False, unique=True, index=True)
+    size = Column(Integer, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP, default=datetime.utcnow)
+
+
+class VoiceStatus(enum.Enum):
+    pending = "pending"
+    processing = "processing"
+    ready = "ready"
+    failed = "failed"
+
+
+class VoiceTranscode(Base):
+    __tablename__ = "voice_transcodes"
+    metadata = metadata
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    source = Column(String, nullable=False, unique=True, index=True)
+    status = Column(String, default=VoiceStatus.pending.value, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+    opus_path = Column(String, nullable=True)
+    duration = Column(Float, nullable=True)
+    waveform = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, default=datetime.utcnow)
+    finished_at = Column(TIMESTAMP, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_voice_transcodes_status_next_attempt_at", "status", "next_attempt_at"
+        ),
+    )
+
+
+class MailStatus(enum.Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    failed = "failed"
+
+
+class MailOutbox(Base):
+    __tablename__ = "mail_outbox"
+    metadata = metadata
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String)
+    message = Column(Text, nullable=False)
+    status = Column(String, default=MailStatus.pending.value, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(TIMESTAMP, default=datetime.utcnow, nullable=False)
+    created_at = Column(TIMESTAMP, default=datetime.utcnow)
+    sent_at = Column(TIMESTAMP, nullable=True)
+
+    __table_args__ = (
+        Index("ix_mail_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
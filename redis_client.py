@@ -0,0 +1,74 @@
+import time
+
+import redis.asyncio as aioredis
+
+from settings import REDIS_URL, REDIS_MAX_CONNECTIONS, REDIS_BACKEND
+
+
+class RedisStore:
+    def __init__(self, url: str, max_connections: int):
+        self.pool = aioredis.ConnectionPool.from_url(
+            url, max_connections=max_connections, decode_responses=True
+        )
+        self.client = aioredis.Redis(connection_pool=self.pool)
+
+    async def set(self, key: str, value, ttl: int = None):
+        await self.client.set(key, value, ex=ttl)
+
+    async def get(self, key: str):
+        return await self.client.get(key)
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+    async def pop(self, key: str):
+        async with self.client.pipeline(transaction=True) as pipe:
+            value, _ = await pipe.get(key).delete(key).execute()
+        return value
+
+    async def close(self):
+        await self.client.aclose()
+        await self.pool.disconnect()
+
+
+class MemoryStore:
+    def __init__(self):
+        self.data = {}
+
+    def _get_entry(self, key: str):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    async def set(self, key: str, value, ttl: int = None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        self.data[key] = (str(value), expires_at)
+
+    async def get(self, key: str):
+        entry = self._get_entry(key)
+        return entry[0] if entry else None
+
+    async def delete(self, key: str):
+        self.data.pop(key, None)
+
+    async def pop(self, key: str):
+        entry = self._get_entry(key)
+        self.data.pop(key, None)
+        return entry[0] if entry else None
+
+    async def close(self):
+        self.data.clear()
+
+
+def create_store(backend: str):
+    if backend == "memory":
+        return MemoryStore()
+    return RedisStore(REDIS_URL, REDIS_MAX_CONNECTIONS)
+
+
+redis_store = create_store(REDIS_BACKEND)
@@ -0,0 +1,193 @@
+"""Seed a scratch schema with realistic volumes and compare query plans and
+latencies of the hot lookups with and without the secondary indexes.
+
+Usage: python -m scripts.bench_indexes [--users N] [--tasks N] [--messages N]
+
+Runs against the database configured in .env, inside a throwaway
+``bench_indexes`` schema that is dropped at the end.
+"""
+import argparse
+import json
+import statistics
+
+from sqlalchemy import create_engine, text
+
+from models.models import metadata
+from settings import (
+    POSTGRES_DB,
+    POSTGRES_PASSWORD,
+    POSTGRES_HOST,
+    POSTGRES_PORT,
+    POSTGRES_USER,
+)
+
+SCHEMA = "bench_indexes"
+
+QUERIES = {
+    "login by email": (
+        "SELECT * FROM users WHERE email = :email",
+        {"email": "user4242@example.com"},
+    ),
+    "register phone check": (
+        "SELECT * FROM users WHERE phone_number = :phone",
+        {"phone": "+998900004242"},
+    ),
+    "admin lookup": ("SELECT * FROM users WHERE status = true", {}),
+    "tasks of user or degree": (
+        'SELECT * FROM tasks WHERE "user" = :user_id OR degree = :degree',
+        {"user_id": 4242, "degree": 3},
+    ),
+    "tasks by status": (
+        "SELECT * FROM tasks WHERE status = :status",
+        {"status": "Bajarilayotgan"},
+    ),
+    "chat history": (
+        "SELECT * FROM messages WHERE (sender_id = :a AND receiver_id = :b) "
+        "OR (sender_id = :b AND receiver_id = :a)",
+        {"a": 42, "b": 43},
+    ),
+    "room by pair": (
+        "SELECT * FROM room WHERE (sender_id = :a AND receiver_id = :b) "
+        "OR (sender_id = :b AND receiver_id = :a)",
+        {"a": 42, "b": 43},
+    ),
+    "room by key": ("SELECT * FROM room WHERE key = :key", {"key": "key-4242"}),
+    "task messages of sender": (
+        "SELECT * FROM user_messages_to_admin_via_task "
+        "WHERE task_id = :task_id AND sender_id = :sender_id",
+        {"task_id": 4242, "sender_id": 42},
+    ),
+}
+
+SEED_SQL = [
+    """
+    INSERT INTO degree (degree, created)
+    SELECT 'degree ' || i, now() FROM generate_series(1, :degrees) i
+    """,
+    """
+    INSERT INTO users (first_name, last_name, phone_number, email, degree,
+                       password, status, date_joined)
+    SELECT 'First' || i, 'Last' || i, '+99890' || lpad(i::text, 7, '0'),
+           'user' || i || '@example.com', 1 + i % :degrees, 'x',
+           i % 1000 = 0, now()
+    FROM generate_series(1, :users) i
+    """,
+    """
+    INSERT INTO tasks (title, description, degree, "user", created_at,
+                       deadline, importance, status, created_in_timestamp)
+    SELECT 'Task ' || i, 'Description', 1 + i % :degrees, 1 + i % :users,
+           current_date, current_date + (i % 90),
+           (ARRAY['Yuqori', 'O''rta', 'Past'])[1 + i % 3],
+           (ARRAY['Yakunlangan', 'Yakunlanmagan', 'Bajarilayotgan'])[1 + i % 3],
+           now()
+    FROM generate_series(1, :tasks) i
+    """,
+    """
+    INSERT INTO messages (sender_id, receiver_id, message, sent_at)
+    SELECT 1 + i % :users, 1 + (i / 7) % :users, 'Message ' || i,
+           now() - (i || ' seconds')::interval
+    FROM generate_series(1, :messages) i
+    """,
+    """
+    INSERT INTO room (key, sender_id, receiver_id, created_at)
+    SELECT 'key-' || i, 1 + i % :users, 1 + (i * 7) % :users, now()
+    FROM generate_series(1, :users) i
+    """,
+    """
+    INSERT INTO user_messages_to_admin_via_task (message, sender_id, task_id,
+                                                 receiver_id, sent_at)
+    SELECT 'Question ' || i, 1 + i % :users, 1 + i % :tasks, 1000, now()
+    FROM generate_series(1, :tasks / 2) i
+    """,
+]
+
+
+def get_secondary_indexes():
+    indexes = []
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            # unique indexes enforce constraints and back foreign keys such as
+            # chat_files.room -> room.key, only lookup indexes are measured
+            if index.unique:
+                continue
+            if [column.name for column in index.columns] != ["id"]:
+                indexes.append(index)
+    return indexes
+
+
+def measure(connection, repeat: int):
+    report = {}
+    for name, (query, params) in QUERIES.items():
+        plan = connection.execute(
+            text(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}"), params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        timings = []
+        for _ in range(repeat):
+            result = connection.execute(
+                text(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}"), params
+            ).scalar()
+            if isinstance(result, str):
+                result = json.loads(result)
+            timings.append(result[0]["Execution Time"])
+        report[name] = {
+            "plan": plan[0]["Plan"]["Node Type"],
+            "index": plan[0]["Plan"].get("Index Name", ""),
+            "median_ms": statistics.median(timings),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--degrees", type=int, default=10)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    url = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={SCHEMA}"})
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+    try:
+        with engine.begin() as connection:
+            metadata.create_all(connection)
+            indexes = get_secondary_indexes()
+            for index in indexes:
+                index.drop(connection)
+            seed_params = {
+                "degrees": args.degrees,
+                "users": args.users,
+                "tasks": args.tasks,
+                "messages": args.messages,
+            }
+            for statement in SEED_SQL:
+                connection.execute(text(statement), seed_params)
+            connection.execute(text("ANALYZE"))
+
+        with engine.begin() as connection:
+            before = measure(connection, args.repeat)
+            for index in indexes:
+                index.create(connection)
+            connection.execute(text("ANALYZE"))
+            after = measure(connection, args.repeat)
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+    print(f"{'query':<26} {'before':>34} {'after':>44}")
+    for name in QUERIES:
+        old, new = before[name], after[name]
+        print(
+            f"{name:<26} {old['plan']:>20} {old['median_ms']:>10.3f} ms"
+            f"   {new['plan']:>20} {new['median_ms']:>10.3f} ms {new['index']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -15,3 +15,98 @@ mail_password = os.environ.get("MAIL_PASSWORD")
 mail_server = os.environ.get("MAIL_SERVER")
 mail_port = os.environ.get("MAIL_PORT")
 mail_from = os.environ.get("MAIL_FROM")
+
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", 8))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+
+MAIL_USE_SSL = os.getenv("MAIL_USE_SSL", "true").lower() == "true"
+MAIL_OUTBOX_BATCH_SIZE = int(os.getenv("MAIL_OUTBOX_BATCH_SIZE", 20))
+MAIL_OUTBOX_POLL_INTERVAL = float(os.getenv("MAIL_OUTBOX_POLL_INTERVAL", 2))
+MAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("MAIL_OUTBOX_MAX_ATTEMPTS", 5))
+MAIL_OUTBOX_RETRY_BACKOFF = float(os.getenv("MAIL_OUTBOX_RETRY_BACKOFF", 30))
+MAIL_OUTBOX_LEASE = float(os.getenv("MAIL_OUTBOX_LEASE", 600))
+MAIL_SMTP_TIMEOUT = float(os.getenv("MAIL_SMTP_TIMEOUT", 30))
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_BACKEND = os.getenv("REDIS_BACKEND", "redis")
+VERIFICATION_CODE_TTL = int(os.getenv("VERIFICATION_CODE_TTL", 600))
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+# how long a worker trusts a cached token before checking revocations again
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", 30))
+REFRESH_TOKEN_LIFETIME = int(os.getenv("REFRESH_TOKEN_LIFETIME", 30 * 24 * 3600))
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+
+ADMIN_ROLE_CACHE_TTL = float(os.getenv("ADMIN_ROLE_CACHE_TTL", 60))
+
+DIRECTORY_PAGE_SIZE = int(os.getenv("DIRECTORY_PAGE_SIZE", 50))
+DIRECTORY_MAX_PAGE_SIZE = int(os.getenv("DIRECTORY_MAX_PAGE_SIZE", 200))
+
+TASK_PAGE_SIZE = int(os.getenv("TASK_PAGE_SIZE", 20))
+TASK_MAX_PAGE_SIZE = int(os.getenv("TASK_MAX_PAGE_SIZE", 100))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", 500))
+DB_STATEMENT_TIMEOUT_DEFAULT = int(os.getenv("DB_STATEMENT_TIMEOUT_DEFAULT", 5000))
+DB_STATEMENT_TIMEOUT_MOBILE = int(os.getenv("DB_STATEMENT_TIMEOUT_MOBILE", 2000))
+DB_STATEMENT_TIMEOUT_ADMIN = int(os.getenv("DB_STATEMENT_TIMEOUT_ADMIN", 30000))
+
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", 50))
+CHAT_MAX_PAGE_SIZE = int(os.getenv("CHAT_MAX_PAGE_SIZE", 200))
+
+CHAT_SEND_QUEUE_SIZE = int(os.getenv("CHAT_SEND_QUEUE_SIZE", 100))
+CHAT_BACKPLANE = os.getenv("CHAT_BACKPLANE", "none")
+
+CHAT_FLUSH_INTERVAL_MS = int(os.getenv("CHAT_FLUSH_INTERVAL_MS", 50))
+CHAT_FLUSH_BATCH_SIZE = int(os.getenv("CHAT_FLUSH_BATCH_SIZE", 200))
+CHAT_FLUSH_MAX_PENDING = int(os.getenv("CHAT_FLUSH_MAX_PENDING", 5000))
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", 20))
+
+ROOM_CACHE_TTL = float(os.getenv("ROOM_CACHE_TTL", 3600))
+ROOM_CACHE_SIZE = int(os.getenv("ROOM_CACHE_SIZE", 10000))
+
+CHAT_FILES_DIR = os.getenv("CHAT_FILES_DIR", "uploads/ChatFiles")
+BLOBS_DIR = os.getenv("BLOBS_DIR", "uploads/blobs")
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR", "uploads/tmp")
+CHAT_MAX_FILE_SIZE = int(os.getenv("CHAT_MAX_FILE_SIZE", 100 * 1024 * 1024))
+FILE_CHUNK_SIZE = int(os.getenv("FILE_CHUNK_SIZE", 64 * 1024))
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", 50 * 1024 * 1024))
+VOICE_MAX_SIZE = int(os.getenv("VOICE_MAX_SIZE", 20 * 1024 * 1024))
+PHOTO_MAX_SIZE = int(os.getenv("PHOTO_MAX_SIZE", 5 * 1024 * 1024))
+
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+VOICE_OPUS_BITRATE = os.getenv("VOICE_OPUS_BITRATE", "24k")
+VOICE_AUDIO_FILTER = os.getenv("VOICE_AUDIO_FILTER", "loudnorm=I=-16:TP=-1.5:LRA=11")
+VOICE_WAVEFORM_POINTS = int(os.getenv("VOICE_WAVEFORM_POINTS", 64))
+VOICE_TRANSCODE_TIMEOUT = float(os.getenv("VOICE_TRANSCODE_TIMEOUT", 120))
+VOICE_TRANSCODE_BATCH_SIZE = int(os.getenv("VOICE_TRANSCODE_BATCH_SIZE", 4))
+VOICE_TRANSCODE_POLL_INTERVAL = float(os.getenv("VOICE_TRANSCODE_POLL_INTERVAL", 5))
+VOICE_TRANSCODE_MAX_ATTEMPTS = int(os.getenv("VOICE_TRANSCODE_MAX_ATTEMPTS", 3))
+VOICE_TRANSCODE_RETRY_BACKOFF = float(os.getenv("VOICE_TRANSCODE_RETRY_BACKOFF", 60))
+VOICE_TRANSCODE_LEASE = float(os.getenv("VOICE_TRANSCODE_LEASE", 600))
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_ACCEL_REDIRECT_PREFIX = os.getenv("STORAGE_ACCEL_REDIRECT_PREFIX", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "http://localhost:9000")
+S3_BUCKET = os.getenv("S3_BUCKET", "hr-mobile")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY", "")
+S3_SECRET_KEY = os.getenv("S3_SECRET_KEY", "")
+S3_PRESIGN_EXPIRES = int(os.getenv("S3_PRESIGN_EXPIRES", 300))
+
+# an addition id can be pointed at a new file, a blob path never changes
+ADDITION_BY_ID_CACHE_CONTROL = os.getenv(
+    "ADDITION_BY_ID_CACHE_CONTROL", "private, no-cache"
+)
+ADDITION_BY_PATH_CACHE_CONTROL = os.getenv(
+    "ADDITION_BY_PATH_CACHE_CONTROL", "private, max-age=31536000, immutable"
+)